@@ -0,0 +1,214 @@
+import asyncio
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from agent.state import build_initial_state
+from agent.streaming import ResearchRun
+from agent.tools.scheduler import SharedWork
+from agent.utils.router import ModelRouter
+from agent.utils.report_cache import JOB_POLL_INTERVAL, STALE, ReportCache, make_cache_key, normalize_topic
+
+
+def dedupe_topics(topics: List[str]) -> List[str]:
+    """Drops empty topics and repeats that only differ in case or spacing."""
+    seen = set()
+    unique = []
+    for topic in topics:
+        key = normalize_topic(topic)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(topic.strip())
+    return unique
+
+
+class BatchRun:
+    """
+    Runs the research graph for many topics with a shared scheduler.
+
+    All runs share one SharedWork instance, so identical search queries and
+    canonical URLs are fetched once for the whole batch and scraped text is
+    reused between topics. At most `max_concurrency` graphs run at a time.
+
+    With a `report_cache`, topics go through the same single-flight path as
+    /research: fresh and stale reports are served from the cache (stale ones
+    are refreshed in the background), a topic already being researched in
+    this process is joined, and one claimed by another worker is awaited.
+    A topic is only claimed once one of the batch's run slots is free, so
+    the claim's lease starts when the run does, not while it sits queued.
+    """
+
+    def __init__(self, graph, topics: List[str], model: str, max_concurrency: int = 4,
+                 max_concurrent_searches: int = 4, max_concurrent_scrapes: int = 8,
+                 report_cache: Optional[ReportCache] = None, bypass_cache: bool = False,
+                 max_cost_usd: Optional[float] = None, max_latency_s: Optional[float] = None):
+        self.graph = graph
+        self.topics = dedupe_topics(topics)
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.report_cache = report_cache
+        self.bypass_cache = bypass_cache
+        # Budgets apply to each topic's run separately
+        self.max_cost_usd = max_cost_usd
+        self.max_latency_s = max_latency_s
+        self.cancel_event = threading.Event()
+        self.shared_work = SharedWork(max_concurrent_searches, max_concurrent_scrapes)
+        self._runs: List[ResearchRun] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def cancel(self):
+        """Stops the runs this batch started; runs it only joined keep going."""
+        self.cancel_event.set()
+        for run in self._runs:
+            run.cancel()
+
+    def _start_run(self, topic: str, refresh: bool, detached: bool = False) -> ResearchRun:
+        """
+        Starts a graph run for `topic` under a held job claim. Detached runs
+        (stale refreshes) use the shared graph executor and outlive the batch.
+        """
+        key = make_cache_key(topic, self.model)
+        run = ResearchRun(
+            self.graph,
+            build_initial_state(topic, self.model),
+            detached=True,
+            on_complete=(lambda report: self.report_cache.store(key, report)) if self.report_cache else None,
+            router=ModelRouter.from_env(self.max_cost_usd, self.max_latency_s),
+            configurable={"shared_work": self.shared_work, "no_llm_cache": refresh},
+        ).start(None if detached else self._executor)
+        if not detached:
+            self._runs.append(run)
+        if self.report_cache is not None:
+            self.report_cache.track_run(key, run)
+        return run
+
+    async def _wait_for_run(self, run: ResearchRun):
+        if not run.done:
+            finished = asyncio.get_running_loop().create_future()
+            run.add_done_callback(lambda _: finished.done() or finished.set_result(None))
+            await finished
+
+    async def _wait_for_remote(self, key: str) -> Optional[str]:
+        """
+        Waits for a run claimed by another worker. Returns its report, or None
+        once the claim is gone without one (the caller then claims the topic).
+        """
+        since = time.time()
+        while not self.cancel_event.is_set():
+            report, still_claimed = await self.report_cache.check_remote(key, since)
+            if report is not None or not still_claimed:
+                return report
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+        return None
+
+    async def _join_or_start(self, topic: str, key: str) -> Optional[ResearchRun]:
+        """
+        Returns the run to wait for: one in progress in this process, or one
+        started here once a run slot is free (it holds the slot until it ends).
+        None if another worker has claimed the topic.
+        """
+        cache = self.report_cache
+        run = cache.get_run(key) if cache is not None else None
+        if run is not None:
+            return run
+        await self._slots.acquire()
+        try:
+            run, claimed = await cache.join_or_claim(key) if cache is not None else (None, True)
+            if claimed and self.cancel_event.is_set():
+                # Cancelled while waiting for the slot; don't start a run nobody will read
+                if cache is not None:
+                    await asyncio.to_thread(cache.release, key)
+                claimed = False
+            if claimed:
+                run = self._start_run(topic, refresh=self.bypass_cache)
+                run.add_done_callback(lambda _: self._slots.release())
+                return run
+        except BaseException:
+            self._slots.release()
+            raise
+        self._slots.release()
+        return run
+
+    async def _topic_result(self, topic: str) -> Dict:
+        started = time.monotonic()
+        try:
+            return await self._research_topic(topic, started)
+        except Exception as e:
+            print(f"Error in batch research for '{topic}': {str(e)}")
+            print(traceback.format_exc())
+            return {"type": "result", "topic": topic, "status": "error", "message": f"Research error: {str(e)}",
+                    "elapsed": round(time.monotonic() - started, 2)}
+
+    async def _research_topic(self, topic: str, started: float) -> Dict:
+        cache = self.report_cache
+        key = make_cache_key(topic, self.model)
+        if cache is not None and not self.bypass_cache:
+            # Storage calls can block (SQLite busy timeout, Redis round trips), so keep them off the loop
+            report, status = await asyncio.to_thread(cache.lookup, key)
+            if report is not None:
+                if status == STALE and cache.get_run(key) is None and await asyncio.to_thread(cache.claim, key):
+                    self._start_run(topic, refresh=True, detached=True)
+                return {"type": "result", "topic": topic, "status": "cached", "cache_status": status,
+                        "report": report}
+
+        while True:
+            if self.cancel_event.is_set():
+                return {"type": "result", "topic": topic, "status": "cancelled"}
+            run = await self._join_or_start(topic, key)
+            if run is None:
+                if self.cancel_event.is_set():
+                    continue
+                report = await self._wait_for_remote(key)
+                if report is not None:
+                    return {"type": "result", "topic": topic, "status": "ok", "report": report,
+                            "elapsed": round(time.monotonic() - started, 2)}
+                continue
+
+            await self._wait_for_run(run)
+            if run.report and not run.failed and not run.cancel_event.is_set():
+                return {"type": "result", "topic": topic, "status": "ok", "report": run.report,
+                        "elapsed": round(time.monotonic() - started, 2), "usage": run.router.report()}
+            if run.cancel_event.is_set():
+                # A joined run whose own clients went away; research the topic here instead
+                continue
+            errors = [p["message"] for payloads in run.history for p in payloads if p["type"] == "error"]
+            return {"type": "result", "topic": topic, "status": "error",
+                    "message": errors[-1] if errors else "Research error: no report was written",
+                    "elapsed": round(time.monotonic() - started, 2)}
+
+    async def results(self, idle_timeout: float = 15):
+        """
+        Yields one result dict per topic as soon as it is ready, then a summary.
+        Yields None whenever nothing finished for `idle_timeout` seconds so the
+        caller can send heartbeats or check for disconnects.
+        """
+        started = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="batch")
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        pending = {asyncio.ensure_future(self._topic_result(topic)) for topic in self.topics}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=idle_timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    yield None
+                for task in done:
+                    yield task.result()
+        finally:
+            # Stops queued and running topics if the consumer goes away; queued runs
+            # still start, see the cancel event and end, which releases their claims
+            self.cancel()
+            for task in pending:
+                task.cancel()
+            self._executor.shutdown(wait=False)
+
+        yield {
+            "type": "summary",
+            "topics": len(self.topics),
+            "shared_work": dict(self.shared_work.stats),
+            "elapsed": round(time.monotonic() - started, 2)
+        }
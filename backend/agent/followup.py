@@ -0,0 +1,305 @@
+import concurrent.futures
+import json
+import re
+from typing import Dict, List, Tuple
+
+from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import StateGraph, END
+
+from agent.graph import format_page, merge_references, scrape_node, search_node
+from agent.state import AgentState
+from agent.tools.browser import cached_page
+from agent.tools.ranking import bm25_scores, tokenize
+from agent.utils.cancellation import raise_if_cancelled
+from agent.utils.content_store import get_content_store
+from agent.utils.router import route_llm
+from agent.utils.sessions import SESSION_MAX_PAGES, get_retained_session
+
+# New pages fetched for a follow-up (a full run scrapes up to 15 per pass)
+FOLLOWUP_SCRAPE_BUDGET = 6
+# Retained pages reused as evidence, picked by relevance to the question
+RETAINED_PAGES = 6
+
+HEADING_RE = re.compile(r"^## +(.+?)\s*$", re.MULTILINE)
+# Entries of a numbered References list ("3. [Title](url)")
+REFERENCE_ENTRY_RE = re.compile(r"^\s*\d+\.\s+(.+?)\s*$", re.MULTILINE)
+NUMBERED_CITATION_RE = re.compile(r"\[\d+\](?!\()")
+
+
+def split_sections(report: str) -> List[Tuple[str, str]]:
+    """
+    Splits a markdown report into (heading, text) pairs at `## ` headings.
+    Text before the first heading gets an empty heading.
+    """
+    sections = []
+    matches = list(HEADING_RE.finditer(report))
+    if not matches or matches[0].start() > 0:
+        sections.append(("", report[:matches[0].start()] if matches else report))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(report)
+        sections.append((match.group(1), report[match.start():end]))
+    return sections
+
+
+def is_references(heading: str) -> bool:
+    return heading.strip().lower() in ("references", "sources", "bibliography")
+
+
+def followup_planner_node(state: AgentState, config: RunnableConfig = None):
+    """
+    Plans only the delta for a follow-up: a few targeted queries and the
+    report sections the answer belongs in.
+    """
+    print("--- PLANNING FOLLOW-UP ---")
+    question = state["followup"]
+    headings = [h for h, _ in split_sections(state["report"]) if h and not is_references(h)]
+    session = get_retained_session(config) or {}
+
+    llm = route_llm(config, "followup_planner", state["model"])
+    prompt = f"""
+    A research report on "{state['topic']}" has already been written.
+
+    Report sections:
+    {chr(10).join(f"- {h}" for h in headings)}
+
+    Searches already done:
+    {chr(10).join(f"- {q}" for q in session.get("queries", [])[-15:])}
+
+    Follow-up question: {question}
+
+    1. Generate 1-3 search queries that find information the existing research is
+       missing for this question. Do not repeat searches already done.
+    2. List the existing section headings (copied exactly) whose content should change
+       to answer the question. Return an empty list if the answer needs a new section.
+
+    Return ONLY a JSON object: {{"queries": [...], "sections": [...]}}
+    """
+
+    queries, sections = [f"{state['topic']} {question}"], []
+    try:
+        raise_if_cancelled(config)
+        response = llm.invoke([
+            SystemMessage(content="You are an expert research planner."),
+            HumanMessage(content=prompt)
+        ])
+        plan = json.loads(response.content.replace("```json", "").replace("```", "").strip())
+        if isinstance(plan.get("queries"), list) and plan["queries"]:
+            queries = [str(q) for q in plan["queries"][:3]]
+        sections = [h for h in plan.get("sections", []) if h in headings]
+    except Exception as e:
+        print(f"Error planning follow-up: {e}")
+
+    return {
+        "plan": [f"Follow-up: {question}"],
+        "search_queries": queries,
+        "sections_to_update": sections,
+        "past_steps": [f"Planned {len(queries)} follow-up queries for {len(sections) or 'a new'} section(s)"]
+    }
+
+
+def followup_scrape_node(state: AgentState, config: RunnableConfig = None):
+    """Scrapes the follow-up results with a smaller page budget."""
+    return scrape_node(state, config, budget=FOLLOWUP_SCRAPE_BUDGET)
+
+
+def retained_evidence(state: AgentState, config: RunnableConfig = None) -> str:
+    """
+    The previously read pages most relevant to the follow-up question (BM25).
+    Sessions only keep the sources, so the text is read back from the page
+    cache; pages that have since expired from it are skipped.
+    """
+    sources = (get_retained_session(config) or {}).get("sources", [])[-SESSION_MAX_PAGES:]
+    pages = []
+    for source in sources:
+        text = cached_page(source["url"])
+        if text is not None:
+            pages.append(format_page(source, text))
+    if not pages:
+        return ""
+    scores = bm25_scores([tokenize(page) for page in pages], tokenize(f"{state['followup']} {state['topic']}"))
+    ranked = sorted(zip(scores, pages), key=lambda pair: -pair[0])
+    return "\n\n".join(page for score, page in ranked[:RETAINED_PAGES] if score > 0)
+
+
+def analyze_followup_node(state: AgentState, config: RunnableConfig = None):
+    """
+    Extracts what the new pages and the relevant retained pages say about the
+    follow-up question.
+    """
+    print("--- ANALYZING FOLLOW-UP ---")
+    store = get_content_store(config)
+    new_pages = "\n\n".join(p for p in (store.get(ref) for ref in state.get("scraped_refs", [])) if p is not None)
+
+    llm = route_llm(config, "analyze_followup", state["model"])
+    prompt = f"""
+    Topic: {state['topic']}
+    Follow-up question: {state['followup']}
+
+    Newly Found Sources:
+    {new_pages or 'None'}
+
+    Previously Read Sources:
+    {retained_evidence(state, config) or 'None'}
+
+    Extract the facts, figures and expert views that answer the follow-up question.
+    Cite the source for every point (e.g., "According to [Source], ...").
+    Use formal academic language. Say explicitly if the sources do not answer part of the question.
+    """
+
+    try:
+        raise_if_cancelled(config)
+        response = llm.invoke([
+            SystemMessage(content="You are a research analyst answering a focused follow-up question."),
+            HumanMessage(content=prompt)
+        ])
+        note = f"### Follow-up: {state['followup']}\n{response.content}"
+    except Exception as e:
+        print(f"Error in follow-up analysis: {e}")
+        note = f"### Follow-up: {state['followup']}\nAnalysis pending..."
+
+    store.release(state.get("scraped_refs", []))
+    return {
+        "research_notes": [note],
+        "past_steps": ["Analyzed follow-up evidence"]
+    }
+
+
+def revise_section(state: AgentState, config: RunnableConfig, heading: str, text: str, note: str) -> str:
+    llm = route_llm(config, "revise", state["model"])
+    if heading:
+        task = f"""
+    Current section of the report:
+    {text}
+
+    Rewrite this section so it also answers the follow-up question using the new findings.
+    Keep its "## {heading}" heading, its existing content and citations unless the findings correct them.
+    """
+    else:
+        task = """
+    Write one new report section answering the follow-up question from the new findings.
+    Start with a "## " heading that fits the report.
+    """
+    prompt = f"""
+    Research report topic: {state['topic']}
+    Follow-up question: {state['followup']}
+
+    New findings:
+    {note}
+    {task}
+    Include inline citations (e.g., [Source Name]) for every claim. Do NOT invent statistics.
+    Return ONLY the markdown of the section.
+    """
+    raise_if_cancelled(config)
+    response = llm.invoke([
+        SystemMessage(content="You are an expert technical writer revising a research report."),
+        HumanMessage(content=prompt)
+    ])
+    text = response.content.strip()
+    if heading and not text.startswith("## "):
+        text = f"## {heading}\n\n{text}"
+    return text + "\n\n"
+
+
+def revise_node(state: AgentState, config: RunnableConfig = None):
+    """
+    Patches the report instead of rewriting it: affected sections are revised
+    concurrently (or one new section is added before the references), and
+    newly read sources are appended to the references.
+
+    A numbered References list (the sectioned writer's) is continued with
+    merge_references, so the patched sections cite [n] like the rest of the
+    report; other reports get the new sources as bullets.
+    """
+    print("--- REVISING REPORT ---")
+    sections = split_sections(state["report"])
+    note = state["research_notes"][-1]
+    targets = [i for i, (heading, _) in enumerate(sections) if heading in state.get("sections_to_update", [])]
+
+    revised: Dict[int, str] = {}
+    new_section = ""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(targets))) as executor:
+        futures = {
+            executor.submit(revise_section, state, config, sections[i][0], sections[i][1], note): i
+            for i in targets
+        }
+        if not targets:
+            futures[executor.submit(revise_section, state, config, "", "", note)] = None
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                text = future.result()
+            except Exception as e:
+                print(f"Error revising section: {e}")
+                continue
+            if futures[future] is None:
+                new_section = text
+            else:
+                revised[futures[future]] = text
+
+    # Sources read for this follow-up (the retained ones are already listed)
+    retained = {s["url"] for s in (get_retained_session(config) or {}).get("sources", [])}
+    new_sources = [s for s in state.get("scraped_urls", []) if s["url"] not in retained]
+    listed = next((REFERENCE_ENTRY_RE.findall(text) for heading, text in sections if is_references(heading)), [])
+    body = "".join(text for heading, text in sections if not is_references(heading))
+    added = len(new_sources)
+    references = ""
+    if listed and NUMBERED_CITATION_RE.search(body):
+        # The report cites [n]: renumber the patched sections and continue the list
+        changed = sorted(revised)
+        texts, numbered = merge_references(
+            {**state, "scraped_urls": new_sources}, config,
+            [revised[i] for i in changed] + ([new_section] if new_section else []), listed
+        )
+        revised.update(zip(changed, texts))
+        if new_section:
+            new_section = texts[-1]
+        sections = [(heading, numbered + "\n" if is_references(heading) else text) for heading, text in sections]
+        added = len(REFERENCE_ENTRY_RE.findall(numbered)) - len(listed)
+    else:
+        # Labelled citations: append entries in the list's own format
+        references = "".join(
+            (f"{len(listed) + k + 1}. " if listed else "- ")
+            + f"[{s.get('title') or s['url']}]({s['url']})"
+            + "".join(f" · [mirror]({d})" for d in s.get("duplicates", []))
+            + "\n"
+            for k, s in enumerate(new_sources)
+        )
+
+    parts = []
+    placed = False
+    for i, (heading, text) in enumerate(sections):
+        if is_references(heading):
+            parts.append(new_section)
+            placed = True
+            parts.append(text.rstrip("\n") + "\n" + references + "\n" if references else text)
+        else:
+            parts.append(revised.get(i, text))
+    if not placed:
+        parts.append(new_section)
+        if references:
+            parts.append("## References\n" + references)
+
+    return {
+        "report": "".join(parts).strip() + "\n",
+        "past_steps": [f"Revised {len(revised)} section(s) and added {added} source(s)"]
+    }
+
+
+# --- Follow-up Graph ---
+
+followup_workflow = StateGraph(AgentState)
+
+followup_workflow.add_node("followup_planner", followup_planner_node)
+followup_workflow.add_node("search", search_node)
+followup_workflow.add_node("scrape", followup_scrape_node)
+followup_workflow.add_node("analyze_followup", analyze_followup_node)
+followup_workflow.add_node("revise", revise_node)
+
+followup_workflow.set_entry_point("followup_planner")
+followup_workflow.add_edge("followup_planner", "search")
+followup_workflow.add_edge("search", "scrape")
+followup_workflow.add_edge("scrape", "analyze_followup")
+followup_workflow.add_edge("analyze_followup", "revise")
+followup_workflow.add_edge("revise", END)
+
+followup_app = followup_workflow.compile()
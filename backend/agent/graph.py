@@ -1,35 +1,75 @@
 import json
-from typing import List
+import os
+import re
+from typing import Dict, List, Optional, Tuple
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
 import concurrent.futures
 
 from agent.state import AgentState
-from agent.utils.llm import get_llm
+from agent.utils.router import route_llm
 from agent.tools.search import perform_search
-from agent.tools.browser import scrape_url
+from agent.tools.browser import canonicalize_url, scrape_url
+from agent.tools.dedup import find_near_duplicates
+from agent.tools.host_health import host_health, interleave_by_host
+from agent.tools.ranking import bm25_scores, choose_scrape_count, rank_results, tokenize
+from agent.tools.scheduler import get_shared_work
+from agent.utils.cancellation import get_cancel_event, raise_if_cancelled
+from agent.utils.content_store import ContentStore, get_content_store
+
+# Maximum number of pages fetched per scrape pass (the ranker usually picks fewer)
+SCRAPE_BUDGET = 15
+# Characters of each scraped page given to the analysis prompts
+PAGE_CHARS = 2000
+
+# "sections": outline, then draft sections in parallel and merge references; "single": one writer call
+WRITER_MODE = os.getenv("WRITER_MODE", "sections").lower()
+MAX_REPORT_SECTIONS = 8
+# Output tokens per drafted section, so report length scales with the outline
+SECTION_MAX_TOKENS = 1500
+# Characters of research notes given to each section writer
+SECTION_NOTES_CHARS = 6000
+# Inline citation labels such as [Reuters] (not markdown links or already numbered [12])
+CITATION_RE = re.compile(r"\[(?!\d+\])([^\[\]]{2,120})\](?!\()")
 
 # --- Parallel Analysis Nodes ---
 
-def analyze_facts_node(state: AgentState):
+def format_evidence(state: AgentState, config: RunnableConfig = None):
+    """
+    Formats the latest search results and scraped pages for the analysis prompts.
+    The three analysis nodes share one copy per iteration via the session's
+    content store instead of each building the same strings.
+    """
+    store = get_content_store(config)
+    search_results = state["search_results"]
+    scraped_refs = state.get("scraped_refs", [])[-10:]
+    key = f"evidence:{state.get('iteration', 0)}:{len(search_results)}:{ContentStore.content_id('|'.join(scraped_refs))}"
+
+    def build_results():
+        formatted_results = ""
+        for r in search_results[-20:]:
+            if isinstance(r, dict):
+                formatted_results += f"- {r.get('title', 'No title')}: {r.get('snippet', '')} ({r.get('link', '')})\n"
+            else:
+                formatted_results += f"- {str(r)}\n"
+        return formatted_results
+
+    def build_scraped():
+        pages = (store.get(ref) for ref in scraped_refs)
+        return "\n\n".join(page for page in pages if page is not None)
+
+    return store.memo(f"{key}:results", build_results), store.memo(f"{key}:scraped", build_scraped)
+
+def analyze_facts_node(state: AgentState, config: RunnableConfig = None):
     """
     Analyzes search results for key facts and data points in parallel.
     """
     print("--- ANALYZING FACTS (PARALLEL) ---")
-    search_results = state["search_results"]
-    scraped_content = state.get("scraped_content", [])
     model = state.get("model", "openai/gpt-4o-mini")
-    llm = get_llm(model_name=model)
+    llm = route_llm(config, "analyze_facts", model)
     
-    # Format results
-    formatted_results = ""
-    for r in search_results[-20:]:
-        if isinstance(r, dict):
-            formatted_results += f"- {r.get('title', 'No title')}: {r.get('snippet', '')} ({r.get('link', '')})\n"
-        else:
-            formatted_results += f"- {str(r)}\n"
-            
-    formatted_scraped = "\n\n".join(scraped_content[-10:])
+    formatted_results, formatted_scraped = format_evidence(state, config)
     
     prompt = f"""
     Topic: {state['topic']}
@@ -58,6 +98,7 @@ def analyze_facts_node(state: AgentState):
     """
     
     try:
+        raise_if_cancelled(config)
         response = llm.invoke([
             SystemMessage(content="You are a data extraction specialist."),
             HumanMessage(content=prompt)
@@ -67,25 +108,15 @@ def analyze_facts_node(state: AgentState):
         print(f"Error in facts analysis: {e}")
         return {"parallel_analyses": {"facts": "Analysis pending..."}}
 
-def analyze_trends_node(state: AgentState):
+def analyze_trends_node(state: AgentState, config: RunnableConfig = None):
     """
     Analyzes search results for trends and developments in parallel.
     """
     print("--- ANALYZING TRENDS (PARALLEL) ---")
-    search_results = state["search_results"]
-    scraped_content = state.get("scraped_content", [])
     model = state.get("model", "openai/gpt-4o-mini")
-    llm = get_llm(model_name=model)
+    llm = route_llm(config, "analyze_trends", model)
     
-    # Format results
-    formatted_results = ""
-    for r in search_results[-20:]:
-        if isinstance(r, dict):
-            formatted_results += f"- {r.get('title', 'No title')}: {r.get('snippet', '')} ({r.get('link', '')})\n"
-        else:
-            formatted_results += f"- {str(r)}\n"
-            
-    formatted_scraped = "\n\n".join(scraped_content[-10:])
+    formatted_results, formatted_scraped = format_evidence(state, config)
     
     prompt = f"""
     Topic: {state['topic']}
@@ -118,6 +149,7 @@ def analyze_trends_node(state: AgentState):
     """
     
     try:
+        raise_if_cancelled(config)
         response = llm.invoke([
             SystemMessage(content="You are a trends analyst."),
             HumanMessage(content=prompt)
@@ -127,25 +159,15 @@ def analyze_trends_node(state: AgentState):
         print(f"Error in trends analysis: {e}")
         return {"parallel_analyses": {"trends": "Analysis pending..."}}
 
-def analyze_insights_node(state: AgentState):
+def analyze_insights_node(state: AgentState, config: RunnableConfig = None):
     """
     Analyzes search results for insights and implications in parallel.
     """
     print("--- ANALYZING INSIGHTS (PARALLEL) ---")
-    search_results = state["search_results"]
-    scraped_content = state.get("scraped_content", [])
     model = state.get("model", "gpt-4o-mini")
-    llm = get_llm(model_name=model)
+    llm = route_llm(config, "analyze_insights", model)
     
-    # Format results
-    formatted_results = ""
-    for r in search_results[-20:]:
-        if isinstance(r, dict):
-            formatted_results += f"- {r.get('title', 'No title')}: {r.get('snippet', '')} ({r.get('link', '')})\n"
-        else:
-            formatted_results += f"- {str(r)}\n"
-            
-    formatted_scraped = "\n\n".join(scraped_content[-10:])
+    formatted_results, formatted_scraped = format_evidence(state, config)
     
     prompt = f"""
     Topic: {state['topic']}
@@ -178,6 +200,7 @@ def analyze_insights_node(state: AgentState):
     """
     
     try:
+        raise_if_cancelled(config)
         response = llm.invoke([
             SystemMessage(content="You are an insights analyst."),
             HumanMessage(content=prompt)
@@ -187,7 +210,7 @@ def analyze_insights_node(state: AgentState):
         print(f"Error in insights analysis: {e}")
         return {"parallel_analyses": {"insights": "Analysis pending..."}}
 
-def synthesize_parallel_node(state: AgentState):
+def synthesize_parallel_node(state: AgentState, config: RunnableConfig = None):
     """
     Synthesizes results from parallel analyses.
     """
@@ -210,18 +233,20 @@ def synthesize_parallel_node(state: AgentState):
 {insights}
 """
     
-    # Append to existing notes if any
-    existing_notes = state.get("research_notes", [])
-    all_notes = existing_notes + [synthesis]
+    # Raw page text has now been analyzed; only the notes are needed from here on
+    store = get_content_store(config)
+    store.release(state.get("scraped_refs", []))
+    store.release_memos("evidence:")
     
+    # research_notes is an additive channel, so only the new note is returned
     return {
-        "research_notes": all_notes,
+        "research_notes": [synthesis],
         "past_steps": ["Synthesized parallel analyses into professional research notes"]
     }
 
 # --- Nodes ---
 
-def planner_node(state: AgentState):
+def planner_node(state: AgentState, config: RunnableConfig = None):
     """
     Generates a research plan and initial search queries.
     """
@@ -230,7 +255,7 @@ def planner_node(state: AgentState):
     model = state.get("model", "gpt-4o-mini")
     iteration = state.get("iteration", 0)
     
-    llm = get_llm(model_name=model)
+    llm = route_llm(config, "planner", model)
     
     if iteration == 0:
         # Initial planning
@@ -267,6 +292,7 @@ def planner_node(state: AgentState):
         """
         
         messages = [SystemMessage(content="You are an expert research planner with deep analytical skills."), HumanMessage(content=prompt)]
+        raise_if_cancelled(config)
         response = llm.invoke(messages)
         
         try:
@@ -292,6 +318,7 @@ def planner_node(state: AgentState):
         """
         
         messages = [SystemMessage(content="You are an expert research planner."), HumanMessage(content=prompt)]
+        raise_if_cancelled(config)
         response = llm.invoke(messages)
         
         try:
@@ -308,17 +335,20 @@ def planner_node(state: AgentState):
         "iteration": iteration
     }
 
-def search_node(state: AgentState):
+def search_node(state: AgentState, config: RunnableConfig = None):
     """
     Executes the search queries.
     """
     print("--- SEARCHING ---")
     queries = state["search_queries"]
+    shared_work = get_shared_work(config)
     results = []
     
     for query in queries:
+        raise_if_cancelled(config)
         print(f"Searching for: {query}")
-        res = perform_search(query)
+        # Batch runs share (and deduplicate) searches across topics
+        res = shared_work.search(query) if shared_work else perform_search(query)
         # res is List[Dict]
         results.extend(res)
         
@@ -327,35 +357,108 @@ def search_node(state: AgentState):
         "past_steps": [f"Searched for {len(queries)} queries"]
     }
 
-def scrape_node(state: AgentState):
+def format_page(source: Dict, content: str) -> str:
+    """A scraped page as the analysis prompts see it; `source` is a scraped_urls entry."""
+    duplicates = source.get("duplicates", [])
+    also = f"\nAlso published at: {', '.join(duplicates)}" if duplicates else ""
+    return f"Source: {source['url']}{also}\nTitle: {source.get('title')}\nContent: {content[:PAGE_CHARS]}..."
+
+def scrape_node(state: AgentState, config: RunnableConfig = None, budget: int = SCRAPE_BUDGET):
     """
-    Scrapes content from the top search results.
+    Scrapes content from the best-ranked search results.
+
+    Results are deduplicated by canonical URL (including pages scraped in
+    earlier iterations) and ranked locally by BM25 relevance to the topic and
+    queries, host success history and domain diversity. The number of pages
+    fetched adapts to how many results score close to the best one, up to
+    `budget`. Results on hosts whose circuit breaker is open are skipped
+    without spending budget, so the next-ranked results take their place.
+
+    Near-duplicate pages (syndicated articles, mirrors) are clustered with
+    MinHash and only the best-ranked page of each cluster is kept for
+    analysis; the other URLs are attached to it as extra citations.
     """
     print("--- SCRAPING ---")
-    results = state["search_results"]
-    # Filter for dicts and take latest 15
-    latest_results = [r for r in results if isinstance(r, dict)][-15:]
-    
+    already_scraped = {
+        canonicalize_url(url)
+        for item in state.get("scraped_urls", [])
+        for url in [item["url"], *item.get("duplicates", [])]
+    }
+    unique_results = {}
+    for r in state["search_results"]:
+        if isinstance(r, dict) and r.get('link'):
+            canonical = canonicalize_url(r['link'])
+            if canonical not in already_scraped:
+                unique_results.setdefault(canonical, r)
+
+    ranked = rank_results(
+        list(unique_results.values()),
+        state["topic"],
+        state.get("search_queries", []),
+        host_prior=host_health.success_rate
+    )
+    budget = choose_scrape_count([score for _, score in ranked], min_count=min(5, budget), max_count=budget)
+    # Selected pages interleaved by host; lower-ranked results are replacements
+    candidates = interleave_by_host([r for r, _ in ranked[:budget]]) + [r for r, _ in ranked[budget:]]
+    scores = {r['link']: score for r, score in ranked}
+    print(f"Ranked {len(ranked)} results, scraping up to {budget}")
+    
+    cancel_event = get_cancel_event(config)
+    shared_work = get_shared_work(config)
+    store = get_content_store(config)
+
+    pages = []
+    attempts = 0
+    skipped = 0
+    for res in candidates:
+        if attempts >= budget:
+            break
+        raise_if_cancelled(config)
+        url = res['link']
+        # Only a peek: scrape_url claims the half-open probe slot when it fetches
+        if host_health.circuit_open(url):
+            print(f"Skipping {url}: host circuit breaker open")
+            skipped += 1
+            continue
+        attempts += 1
+        print(f"Scraping: {url}")
+        try:
+            if shared_work:
+                content = shared_work.scrape(url, cancel_event=cancel_event)
+            else:
+                content = scrape_url(url, cancel_event=cancel_event)
+            if content.startswith("Error scraping"):
+                print(content)
+                continue
+            pages.append((res, content[:PAGE_CHARS]))
+        except Exception as e:
+            print(f"Failed to scrape {url}: {e}")
+
     scraped = []
     scraped_urls = []
-    for res in latest_results:
-        url = res.get('link')
-        if url:
-            print(f"Scraping: {url}")
-            try:
-                content = scrape_url(url)
-                scraped.append(f"Source: {url}\nTitle: {res.get('title')}\nContent: {content[:2000]}...")
-                scraped_urls.append({"url": url, "title": res.get('title', '')})
-            except Exception as e:
-                print(f"Failed to scrape {url}: {e}")
-    
+    for cluster in find_near_duplicates([content for _, content in pages]):
+        # Keep the best-ranked copy (longest on ties); the others become extra citations
+        keep = max(cluster, key=lambda i: (scores[pages[i][0]['link']], len(pages[i][1])))
+        res, content = pages[keep]
+        url = res['link']
+        duplicates = [pages[i][0]['link'] for i in cluster if i != keep]
+        if duplicates:
+            print(f"Near-duplicates of {url}: {', '.join(duplicates)}")
+        source = {"url": url, "title": res.get('title', ''), "score": scores[url], "duplicates": duplicates}
+        # Only a reference goes into the state; the text lives in the session store
+        scraped.append(store.put(format_page(source, content)))
+        scraped_urls.append(source)
+
     return {
-        "scraped_content": scraped,
+        "scraped_refs": scraped,
         "scraped_urls": scraped_urls,
-        "past_steps": [f"Scraped {len(scraped)} pages"]
+        "past_steps": [
+            f"Scraped {len(pages)} of {len(ranked)} ranked results ({skipped} skipped on unhealthy hosts, "
+            f"{len(pages) - len(scraped)} near-duplicates merged)"
+        ]
     }
 
-def research_node(state: AgentState):
+def research_node(state: AgentState, config: RunnableConfig = None):
     """
     Analyzes search results and extracts key information.
     In production, this could scrape actual pages for deeper analysis.
@@ -365,7 +468,7 @@ def research_node(state: AgentState):
     existing_notes = state.get("research_notes", [])
     model = state.get("model", "gpt-4o-mini")
     
-    llm = get_llm(model_name=model)
+    llm = route_llm(config, "research", model)
     
     prompt = f"""
     You are an expert research analyst with exceptional synthesis skills.
@@ -428,6 +531,7 @@ def research_node(state: AgentState):
     ]
     
     try:
+        raise_if_cancelled(config)
         response = llm.invoke(messages)
         analysis = response.content
     except Exception as e:
@@ -439,7 +543,7 @@ def research_node(state: AgentState):
         "past_steps": [f"Analyzed {len(search_results)} search results with deep synthesis"]
     }
 
-def review_node(state: AgentState):
+def review_node(state: AgentState, config: RunnableConfig = None):
     """
     Decides whether to continue researching or write the report.
     Uses LLM to evaluate if more research is needed.
@@ -450,7 +554,7 @@ def review_node(state: AgentState):
     notes = state.get("research_notes", [])
     model = state.get("model", "gpt-4o-mini")
     
-    llm = get_llm(model_name=model)
+    llm = route_llm(config, "review", model)
     
     # Hard limit to prevent infinite loops
     if iteration >= 2:
@@ -481,6 +585,7 @@ def review_node(state: AgentState):
     ]
     
     try:
+        raise_if_cancelled(config)
         response = llm.invoke(messages)
         decision = response.content.strip().upper()
         
@@ -493,11 +598,11 @@ def review_node(state: AgentState):
         # Default to finishing if there's an error
         return {"is_finished": True, "iteration": iteration + 1}
 
-def writer_node(state: AgentState):
+def write_single_report(state: AgentState, config: RunnableConfig = None):
     """
-    Writes the final comprehensive research report.
+    Writes the whole report in one LLM call (WRITER_MODE=single, and the
+    fallback when the sectioned writer fails).
     """
-    print("--- WRITING ---")
     topic = state["topic"]
     notes = state["research_notes"]
     model = state.get("model", "gpt-4o-mini")
@@ -552,7 +657,8 @@ def writer_node(state: AgentState):
     ]
     
     try:
-        writer_llm = get_llm(model_name=model, max_tokens=3000)  # Use more tokens for the final report
+        writer_llm = route_llm(config, "writer", model, max_tokens=3000)  # Use more tokens for the final report
+        raise_if_cancelled(config)
         response = writer_llm.invoke(messages)
         report = response.content
     except Exception as e:
@@ -564,6 +670,241 @@ def writer_node(state: AgentState):
         "past_steps": ["Wrote comprehensive final report"]
     }
 
+def split_notes(notes: List[str]) -> List[str]:
+    """Splits research notes into paragraph-sized chunks for per-section selection."""
+    chunks = []
+    for note in notes:
+        for block in re.split(r"\n\s*\n|\n(?=#+ )", note):
+            block = block.strip()
+            if len(block) > 40:
+                chunks.append(block)
+    return chunks
+
+def select_notes(chunks: List[str], query: str, max_chars: int = SECTION_NOTES_CHARS) -> str:
+    """The note chunks most relevant to a section (BM25), in their original order."""
+    scores = bm25_scores([tokenize(chunk) for chunk in chunks], tokenize(query))
+    picked, used = [], 0
+    for i in sorted(range(len(chunks)), key=lambda i: -scores[i]):
+        if used + len(chunks[i]) > max_chars:
+            continue
+        picked.append(i)
+        used += len(chunks[i])
+    return "\n\n".join(chunks[i] for i in sorted(picked))
+
+def format_sources(state: AgentState) -> str:
+    return "\n".join(
+        f"- {item.get('title') or item['url']}: {item['url']}"
+        + (f" (also at {', '.join(item['duplicates'])})" if item.get("duplicates") else "")
+        for item in state.get("scraped_urls", [])
+    )
+
+def outline_report(state: AgentState, config: RunnableConfig = None) -> Dict:
+    """
+    Asks for a compact outline: the report title and, per section, a heading
+    and what it should cover. Raises if no usable outline comes back.
+    """
+    notes = state["research_notes"]
+    headings = [line for note in notes for line in note.splitlines() if line.startswith("#")]
+    prompt = f"""
+    Plan a comprehensive research report on: {state['topic']}
+
+    The research notes cover these headings:
+    {chr(10).join(headings)}
+
+    **ADAPT THE STRUCTURE TO THE TOPIC**
+    - "How-to", guide or process topics: Introduction, Step-by-Step Process, Requirements & Paperwork
+      (checklist of documents/forms), Costs & Financials, Common Pitfalls/Tips, Conclusion.
+    - Market analysis or general research: Introduction, Key Statistics, Market Landscape,
+      Challenges & Opportunities, Future Outlook, Conclusion.
+
+    Use at most {MAX_REPORT_SECTIONS} sections and do not include a References section.
+
+    Return ONLY a JSON object:
+    {{"title": "...", "sections": [{{"heading": "...", "covers": "one sentence on the content"}}]}}
+    """
+    llm = route_llm(config, "writer_outline", state.get("model", "gpt-4o-mini"), max_tokens=600)
+    raise_if_cancelled(config)
+    response = llm.invoke([
+        SystemMessage(content="You are an expert technical writer planning a report."),
+        HumanMessage(content=prompt)
+    ])
+    outline = json.loads(response.content.replace("```json", "").replace("```", "").strip())
+    sections = [s for s in outline.get("sections", []) if isinstance(s, dict) and s.get("heading")]
+    sections = [s for s in sections if s["heading"].strip().lower() not in ("references", "sources")]
+    if not sections:
+        raise ValueError("outline has no sections")
+    return {"title": outline.get("title") or f"Research Report: {state['topic']}", "sections": sections[:MAX_REPORT_SECTIONS]}
+
+def draft_section(state: AgentState, config: RunnableConfig, outline: Dict, index: int, notes: str, sources: str) -> str:
+    """Writes one report section from the notes selected for it."""
+    section = outline["sections"][index]
+    prompt = f"""
+    You are writing one section of a research report titled "{outline['title']}".
+
+    Report outline:
+    {chr(10).join(f"{i + 1}. {s['heading']}" for i, s in enumerate(outline["sections"]))}
+
+    Write section {index + 1}: "{section['heading']}"
+    It should cover: {section.get('covers', '')}
+
+    Research Notes for this section:
+    {notes or 'No specific notes; summarize what the research established about this aspect.'}
+
+    Sources:
+    {sources or 'None recorded'}
+
+    **MANDATORY REQUIREMENTS:**
+    1. **Citations**: Include inline citations for every claim, statistic, or fact (e.g., [Source Name]), naming sources as listed above.
+    2. **Accuracy**: Do NOT invent statistics. If exact numbers are missing, state "Data not available" or give a qualitative range.
+    3. **Scope**: Cover only this section; other sections are written separately. Do not add a References list.
+    4. **Tone**: Professional, objective, and authoritative.
+
+    Start with "## {section['heading']}" and use Markdown (### subheadings, **Bold**, tables, bullet points) as needed.
+    """
+    llm = route_llm(config, "writer_section", state.get("model", "gpt-4o-mini"), max_tokens=SECTION_MAX_TOKENS)
+    raise_if_cancelled(config)
+    response = llm.invoke([
+        SystemMessage(content="You are an expert technical writer and researcher known for clear, comprehensive reports."),
+        HumanMessage(content=prompt)
+    ])
+    text = response.content.strip()
+    if not text.startswith("## "):
+        text = f"## {section['heading']}\n\n{text}"
+    return text
+
+def format_references(entries: List[str]) -> str:
+    listed = "".join(f"{i + 1}. {entry}\n" for i, entry in enumerate(entries))
+    return "## References\n\n" + listed if listed else ""
+
+def list_references(state: AgentState, listed: Optional[List[str]] = None) -> str:
+    """Numbered References: `listed` entries keep their numbers, recorded sources not among them follow."""
+    entries = list(listed or [])
+    known = "\n".join(entries)
+    entries += [f"[{item.get('title') or item['url']}]({item['url']})"
+                for item in state.get("scraped_urls", []) if item["url"] not in known]
+    return format_references(entries)
+
+def merge_references(state: AgentState, config: RunnableConfig, sections: List[str],
+                     listed: Optional[List[str]] = None) -> Tuple[List[str], str]:
+    """
+    Builds one References section for the drafted sections: a small call maps
+    the inline citations they use onto distinct sources, and every inline
+    label is rewritten to its source's number, e.g. [Reuters] -> [3].
+
+    `listed` continues an existing numbered list (a follow-up revising a
+    report): its entries keep their numbers, labels citing them get those
+    numbers, and new sources are numbered after them. Returns the rewritten
+    sections and the complete References section.
+    """
+    listed = list(listed or [])
+    citations = sorted(set(CITATION_RE.findall("\n".join(sections))))
+    if not citations:
+        return sections, list_references(state, listed)
+    if listed:
+        known = f"""
+    References already listed, which keep their numbers:
+    {chr(10).join(f"{i + 1}. {entry}" for i, entry in enumerate(listed))}
+"""
+        numbering = (f"to its reference number: its number above if it is already listed, otherwise "
+                     f"{len(listed)} plus its 1-based position in your list")
+    else:
+        known = ""
+        numbering = "to the 1-based position of its source"
+    prompt = f"""
+    The sections of a research report cite these sources inline:
+    {chr(10).join(f"- [{c}]" for c in citations)}
+    {known}
+    Sources consulted during research:
+    {format_sources(state) or 'None recorded'}
+
+    List each distinct source cited above{" that is not already listed" if listed else ""} once (merge citations
+    that refer to the same source), with its title and its URL where it appears in the list (empty if it does not),
+    and map every citation label, copied exactly without brackets, {numbering}.
+
+    Return ONLY a JSON object:
+    {{"sources": [{{"title": "...", "url": "..."}}], "citations": {{"label": {len(listed) + 1}}}}}
+    """
+    llm = route_llm(config, "writer_merge", state.get("model", "gpt-4o-mini"), max_tokens=1000)
+    try:
+        raise_if_cancelled(config)
+        response = llm.invoke([
+            SystemMessage(content="You are a meticulous research editor."),
+            HumanMessage(content=prompt)
+        ])
+        merged = json.loads(response.content.replace("```json", "").replace("```", "").strip())
+        cited = [s for s in merged["sources"] if isinstance(s, dict) and s.get("title")]
+        numbers = {
+            label: number for label, number in merged["citations"].items()
+            if isinstance(number, int) and 1 <= number <= len(listed) + len(cited)
+        }
+        if not numbers:
+            raise ValueError("no citation could be mapped to a source")
+    except Exception as e:
+        print(f"Error merging references: {e}")
+        return sections, list_references(state, listed)
+
+    def renumber(match):
+        number = numbers.get(match.group(1))
+        return f"[{number}]" if number else match.group(0)
+
+    entries = listed + [f"[{s['title']}]({s['url']})" if s.get("url") else s["title"] for s in cited]
+    return [CITATION_RE.sub(renumber, section) for section in sections], format_references(entries)
+
+def draft_section_with_retry(state: AgentState, config: RunnableConfig, outline: Dict, index: int,
+                             notes: str, sources: str) -> str:
+    """draft_section, tried a second time if the first attempt fails."""
+    try:
+        return draft_section(state, config, outline, index, notes, sources)
+    except Exception as e:
+        print(f"Error drafting section {outline['sections'][index]['heading']}, retrying: {e}")
+    return draft_section(state, config, outline, index, notes, sources)
+
+def write_sectioned_report(state: AgentState, config: RunnableConfig = None):
+    """
+    Writes the report as an outline plus sections drafted concurrently, each
+    from the note chunks most relevant to it, followed by one merge pass for
+    the references. Wall time is roughly the slowest section, and length is
+    bounded per section rather than by a single call's max_tokens. Raises if
+    a section still fails after one retry, so the report never silently
+    misses part of its outline.
+    """
+    outline = outline_report(state, config)
+    chunks = split_notes(state["research_notes"])
+    sources = format_sources(state)
+    print(f"Drafting {len(outline['sections'])} sections in parallel")
+
+    drafts: Dict[int, str] = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(outline["sections"])) as executor:
+        futures = {
+            executor.submit(
+                draft_section_with_retry, state, config, outline, i,
+                select_notes(chunks, f"{section['heading']} {section.get('covers', '')}"), sources
+            ): i
+            for i, section in enumerate(outline["sections"])
+        }
+        for future in concurrent.futures.as_completed(futures):
+            drafts[futures[future]] = future.result()
+
+    sections, references = merge_references(state, config, [drafts[i] for i in sorted(drafts)])
+    report = f"# {outline['title']}\n\n" + "\n\n".join(sections + ([references] if references else []))
+    return {
+        "report": report,
+        "past_steps": [f"Wrote report in {len(sections)} parallel sections"]
+    }
+
+def writer_node(state: AgentState, config: RunnableConfig = None):
+    """
+    Writes the final comprehensive research report, section-wise in parallel
+    unless WRITER_MODE=single.
+    """
+    print("--- WRITING ---")
+    if WRITER_MODE != "single":
+        try:
+            return write_sectioned_report(state, config)
+        except Exception as e:
+            print(f"Sectioned writing failed, writing in one call: {e}")
+    return write_single_report(state, config)
+
 # --- Graph Definition ---
 
 workflow = StateGraph(AgentState)
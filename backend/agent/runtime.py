@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Dict, Optional
+
+_agent_app = None
+_followup_app = None
+_agent_app_lock = threading.Lock()
+
+# Readiness as reported by /ready
+warmup_state: Dict[str, Optional[object]] = {
+    "ready": False,
+    "error": None,
+    "seconds": None,
+}
+
+
+def get_agent_app():
+    """
+    Returns the compiled LangGraph workflow, importing it on first use.
+
+    agent.graph pulls in LangGraph, langchain_openai, langchain_community and
+    BeautifulSoup, so it is kept out of the API's import path and built
+    once per process (normally by warm_up during startup).
+    """
+    global _agent_app
+    if _agent_app is None:
+        with _agent_app_lock:
+            if _agent_app is None:
+                from agent.graph import app
+                _agent_app = app
+    return _agent_app
+
+
+def get_followup_app():
+    """Returns the compiled follow-up workflow (agent.followup), importing it on first use."""
+    global _followup_app
+    if _followup_app is None:
+        with _agent_app_lock:
+            if _followup_app is None:
+                from agent.followup import followup_app
+                _followup_app = followup_app
+    return _followup_app
+
+
+def get_batch_run():
+    """
+    Returns agent.batch.BatchRun, importing it (and the graph it runs) on first
+    use. Blocking: call it from a worker thread, not the event loop.
+    """
+    get_agent_app()
+    from agent.batch import BatchRun
+    return BatchRun
+
+
+def warm_up(default_model: str = "openai/gpt-4o-mini"):
+    """
+    Imports the heavy modules and builds the long-lived clients (compiled graph,
+    scraper HTTP session, search wrapper, default LLM client, storage backend)
+    so the first request doesn't pay for them. Safe to call more than once.
+    """
+    started = time.perf_counter()
+    try:
+        get_batch_run()
+        get_followup_app()
+
+        from agent.tools.search import get_search_wrapper
+        from agent.utils.llm import get_llm
+        from agent.utils.storage import get_storage
+
+        get_search_wrapper()
+        get_llm(model_name=default_model)
+        get_storage()
+
+        warmup_state["ready"] = True
+        warmup_state["error"] = None
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+        warmup_state["error"] = str(e)
+    finally:
+        warmup_state["seconds"] = round(time.perf_counter() - started, 3)
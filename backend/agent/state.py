@@ -1,5 +1,5 @@
 import operator
-from typing import Annotated, List, TypedDict, Union, Dict
+from typing import Annotated, List, TypedDict, Union, Dict, get_type_hints
 
 def merge_dicts(left: Dict, right: Dict) -> Dict:
     """Merge two dictionaries, combining their keys."""
@@ -12,9 +12,62 @@ class AgentState(TypedDict):
     past_steps: Annotated[List[str], operator.add]
     search_queries: List[str]
     search_results: Annotated[List[any], operator.add]
-    scraped_content: Annotated[List[str], operator.add]
+    scraped_urls: Annotated[List[Dict], operator.add]  # {"url", "title", "score", "duplicates"} for every scraped page
+    scraped_refs: Annotated[List[str], operator.add]  # Content store IDs of scraped pages (text lives in the session ContentStore)
     research_notes: Annotated[List[str], operator.add]
     parallel_analyses: Annotated[Dict[str, str], merge_dicts]  # Store parallel analysis results with merging
     report: str
     is_finished: bool
     iteration: int
+    followup: str  # Follow-up question when extending a retained session's report
+    sections_to_update: List[str]  # Report headings the follow-up affects
+
+def apply_update(state: Dict, update: Dict) -> Dict:
+    """
+    Applies a node's state update to a plain dict the way the graph does,
+    using each channel's reducer (e.g. additive lists) where one is declared.
+    """
+    hints = get_type_hints(AgentState, include_extras=True)
+    for key, value in update.items():
+        reducer = getattr(hints.get(key), "__metadata__", (None,))[0]
+        if reducer is not None and key in state:
+            state[key] = reducer(state[key], value)
+        else:
+            state[key] = value
+    return state
+
+def build_initial_state(topic: str, model: str) -> AgentState:
+    """Returns a fresh state for a new research run."""
+    return {
+        "topic": topic.strip(),
+        "model": model,
+        "plan": [],
+        "past_steps": [],
+        "search_queries": [],
+        "search_results": [],
+        "research_notes": [],
+        "report": "",
+        "is_finished": False,
+        "iteration": 0
+    }
+
+def build_followup_state(session: Dict, question: str, model: str) -> AgentState:
+    """
+    Starts a follow-up from a retained session: its notes and sources are
+    carried over, so scrape_node skips pages that were already read.
+    """
+    return {
+        "topic": session["topic"],
+        "model": model,
+        "plan": [],
+        "past_steps": [],
+        "search_queries": [],
+        "search_results": [],
+        "scraped_urls": list(session["sources"]),
+        "research_notes": list(session["research_notes"]),
+        "report": session["report"],
+        "is_finished": False,
+        "iteration": 0,
+        "followup": question.strip(),
+        "sections_to_update": [],
+    }
@@ -0,0 +1,285 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from agent.utils.cancellation import ResearchCancelled
+from agent.utils.content_store import ContentStore
+from agent.utils.router import ModelRouter
+from agent.utils.sessions import SessionRecorder
+
+# Seconds of silence after which an SSE comment is sent so proxies keep the connection open
+HEARTBEAT_INTERVAL = 15
+# How often the client connection is polled while waiting for graph events
+DISCONNECT_POLL_INTERVAL = 1.0
+# Window during which bursty graph events are collected into a single SSE message
+COALESCE_WINDOW = 0.1
+# Graph runs in flight per process; further runs queue until a slot frees up
+MAX_CONCURRENT_RUNS = int(os.getenv("MAX_CONCURRENT_RUNS", "8"))
+
+# Runs take minutes, so they get their own threads instead of the loop's default
+# executor, which stays free for short blocking calls (asyncio.to_thread)
+graph_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_RUNS, thread_name_prefix="graph")
+
+
+def format_sse(data: Dict) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+
+def node_update_messages(node_name: str, state_update: Dict) -> List[Dict]:
+    """
+    Translates a single graph state update into the SSE payloads the frontend understands.
+    """
+    messages = []
+    if node_name in ("planner", "followup_planner"):
+        for query in state_update.get("search_queries", []):
+            messages.append({"type": "update", "node": node_name, "message": f"Searching for: {query}"})
+
+    elif node_name == "search":
+        messages.append({"type": "update", "node": node_name, "message": "Searching..."})
+
+    elif node_name == "scrape":
+        # Send scraped URLs to frontend
+        scraped_urls = state_update.get("scraped_urls", [])
+        for item in scraped_urls:
+            messages.append({
+                "type": "update",
+                "node": node_name,
+                "message": f"Scraping: {item['url']}",
+                "title": item.get("title", ""),
+                "score": item.get("score"),  # Pre-scrape ranker score (0-1)
+                "duplicates": item.get("duplicates", [])  # Near-duplicate copies of this page
+            })
+
+        # Send general message if no URLs
+        if not scraped_urls:
+            messages.append({"type": "update", "node": node_name, "message": "Reading sources..."})
+
+    elif "analyze" in node_name:
+        messages.append({"type": "update", "node": node_name, "message": "ANALYZING"})
+
+    elif node_name == "synthesize_parallel":
+        messages.append({"type": "update", "node": node_name, "message": "SYNTHESIZING"})
+
+    elif node_name in ("writer", "revise"):
+        messages.append({"type": "update", "node": node_name, "message": "WRITING"})
+
+    else:
+        # Generic update for other nodes
+        messages.append({
+            "type": "update",
+            "node": node_name,
+            "message": f"✓ Completed: {node_name.replace('_', ' ').title()}"
+        })
+
+    # If we have a report, send it specifically
+    if state_update and state_update.get("report"):
+        messages.append({"type": "complete", "report": state_update["report"]})
+
+    return messages
+
+
+def coalesce(payloads: List[Dict]) -> str:
+    """
+    Packs several payloads into one SSE message to cut per-event overhead.
+    """
+    if len(payloads) == 1:
+        return format_sse(payloads[0])
+    return format_sse({"type": "batch", "events": payloads})
+
+
+class ResearchRun:
+    """
+    A single graph execution whose progress can be followed by several clients.
+
+    The graph runs in a worker thread and receives a cancel event through its run
+    config. Payloads are fanned out to every subscriber queue; late subscribers get
+    the history replayed first. When the last subscriber leaves, the run is
+    cancelled unless it is `detached` (e.g. a background cache refresh).
+
+    LLM calls are routed per node by `router`; its spend and latency report is
+    published as a `usage` payload when the run ends. With a `recorder`, the
+    run's outcome is retained as a session for follow-ups and the `complete`
+    payload carries its `session_id`. `configurable` adds entries to the
+    graph's run config.
+    """
+
+    def __init__(self, graph, initial_state: Dict, detached: bool = False,
+                 on_complete: Optional[Callable[[str], None]] = None,
+                 router: Optional[ModelRouter] = None,
+                 recorder: Optional[SessionRecorder] = None,
+                 configurable: Optional[Dict] = None):
+        self.graph = graph
+        self.router = router or ModelRouter.from_env()
+        self.recorder = recorder
+        self.configurable = configurable or {}
+        self.initial_state = initial_state
+        self.detached = detached
+        self.on_complete = on_complete
+        self.cancel_event = threading.Event()
+        self.history: List[List[Dict]] = []
+        self.subscribers: List[asyncio.Queue] = []
+        self.report: Optional[str] = None
+        self.failed = False
+        self.done = False
+        self._done_callbacks: List[Callable[["ResearchRun"], None]] = []
+        self._loop = None
+
+    def start(self, executor: Optional[Executor] = None):
+        """Runs the graph on `executor` (default: the shared graph_executor)."""
+        self._loop = asyncio.get_running_loop()
+        self._loop.run_in_executor(executor or graph_executor, self._run_graph)
+        return self
+
+    def add_done_callback(self, callback: Callable[["ResearchRun"], None]):
+        """Callbacks run on the event loop thread when the run ends; they must not block."""
+        self._done_callbacks.append(callback)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        for payloads in self.history:
+            queue.put_nowait(payloads)
+        if self.done:
+            queue.put_nowait(None)
+        self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self.subscribers:
+            self.subscribers.remove(queue)
+        if not self.subscribers and not self.detached and not self.done:
+            print("No clients left, cancelling research run")
+            self.cancel()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _run_graph(self):
+        # Bulky page text for this run lives in its own store, freed when the run ends
+        content_store = ContentStore()
+        config = {"configurable": {
+            **self.configurable,
+            "cancel_event": self.cancel_event,
+            "content_store": content_store,
+            "router": self.router,
+        }}
+        report = None
+        try:
+            if self.cancel_event.is_set():
+                # Cancelled while waiting for a worker thread
+                raise ResearchCancelled()
+            for event in self.graph.stream(self.initial_state, config=config):
+                if self.cancel_event.is_set():
+                    break
+                report = next((u["report"] for u in event.values() if u and u.get("report")), report)
+                if self.recorder:
+                    for state_update in event.values():
+                        self.recorder.observe(state_update or {})
+                    # Saved before the report is published so a follow-up can start right away
+                    if any((update or {}).get("report") for update in event.values()):
+                        self.recorder.save()
+                self._publish("event", event)
+            if report and not self.cancel_event.is_set() and self.on_complete:
+                # On this worker thread: on_complete writes to storage, which can block
+                self.on_complete(report)
+        except ResearchCancelled:
+            print("Research run cancelled")
+        except Exception as e:
+            print(f"Error in research agent: {str(e)}")
+            print(traceback.format_exc())
+            self._publish("error", e)
+        finally:
+            content_store.close()
+            usage = self.router.report()
+            print(f"Run usage: ${usage['total_cost_usd']:.4f} in {usage['elapsed_s']}s")
+            self._publish("usage", usage)
+            self._publish("done")
+
+    def _publish(self, kind, value=None):
+        self._loop.call_soon_threadsafe(self._dispatch, kind, value)
+
+    def _dispatch(self, kind, value):
+        """Runs on the event loop thread; turns worker output into payloads."""
+        if kind == "done":
+            self.done = True
+            for queue in self.subscribers:
+                queue.put_nowait(None)
+            for callback in self._done_callbacks:
+                callback(self)
+            return
+
+        if kind == "error":
+            self.failed = True
+            payloads = [{"type": "error", "message": f"Research error: {str(value)}"}]
+        elif kind == "usage":
+            payloads = [{"type": "usage", **value}]
+        else:
+            # event is a dict like {'node_name': {state_updates}}
+            payloads = []
+            for node_name, state_update in value.items():
+                payloads.extend(node_update_messages(node_name, state_update or {}))
+                if state_update and state_update.get("report"):
+                    self.report = state_update["report"]
+            if self.recorder:
+                for payload in payloads:
+                    if payload["type"] == "complete":
+                        payload["session_id"] = self.recorder.session_id
+
+        self.history.append(payloads)
+        for queue in self.subscribers:
+            queue.put_nowait(payloads)
+
+
+async def stream_run(run: ResearchRun, http_request=None):
+    """
+    Yields SSE messages for one client following a ResearchRun.
+
+    - Leaving (disconnect, or this generator being closed) unsubscribes the client,
+      which cancels the run once nobody else is following it.
+    - A heartbeat comment is emitted whenever the stream has been idle for
+      HEARTBEAT_INTERVAL seconds.
+    - Payloads that arrive close together are coalesced into one "batch" message.
+    """
+    queue = run.subscribe()
+    last_write = time.monotonic()
+
+    try:
+        while True:
+            if http_request is not None and await http_request.is_disconnected():
+                print("Client disconnected from research stream")
+                break
+
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=DISCONNECT_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                if time.monotonic() - last_write >= HEARTBEAT_INTERVAL:
+                    yield ": heartbeat\n\n"
+                    last_write = time.monotonic()
+                continue
+
+            # Give bursty producers a moment, then drain everything that is ready
+            await asyncio.sleep(COALESCE_WINDOW)
+            items = [item]
+            while not queue.empty():
+                items.append(queue.get_nowait())
+
+            payloads = []
+            finished = False
+            for entry in items:
+                if entry is None:
+                    finished = True
+                else:
+                    payloads.extend(entry)
+
+            if payloads:
+                yield coalesce(payloads)
+                last_write = time.monotonic()
+            if finished:
+                break
+    finally:
+        run.unsubscribe(queue)
+
@@ -1,32 +1,129 @@
+import os
+import time
+from typing import Optional
+
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from agent.tools.host_health import host_health, looks_like_captcha
+from agent.utils.storage import get_storage
+
+MAX_DOWNLOAD_BYTES = 2_000_000
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "86400"))
+
+# One pooled session per process so repeated scrapes reuse connections
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+_session.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src"}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Reduces a URL to a canonical form so the same page reached via different
+    links (tracking params, fragments, trailing slashes, www.) is fetched once.
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit((parts.scheme.lower() or "http", host, path, query, ""))
+
+
+def is_host_failure(error: Exception) -> bool:
+    """
+    Errors that say something about the host rather than one page: timeouts,
+    connection errors, and 403/429/5xx answers. A 404 or 410 is one dead link.
+    """
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status in (403, 429) or status >= 500
+    return isinstance(error, (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError))
 
-def scrape_url(url: str) -> str:
+
+def cached_page(url: str) -> Optional[str]:
+    """Extracted text of a page scraped before, or None if it is not (or no longer) cached."""
+    return get_storage().get(f"page:{canonicalize_url(url)}")
+
+
+def scrape_url(url: str, cancel_event=None) -> str:
     """
     Visits a URL and extracts the main text content.
+    If a cancel_event is given, the download is aborted as soon as it is set.
+    Extracted text is cached in the shared storage under the canonical URL.
+
+    Live fetches go through the host health registry: hosts with an open
+    circuit breaker are skipped, requests to one host are spaced out, the
+    timeout adapts to the host's observed latency, and every outcome is
+    recorded. Timeouts, connection errors, 403/429/5xx and captcha walls count
+    against the host; a missing page (404, 410, ...) does not.
     """
+    storage = get_storage()
+    cache_key = f"page:{canonicalize_url(url)}"
+    cached = storage.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if not host_health.is_available(url):
+        return f"Error scraping {url}: host temporarily skipped after repeated failures"
+
+    host_health.wait_turn(url, cancel_event=cancel_event)
+    if cancel_event is not None and cancel_event.is_set():
+        return f"Error scraping {url}: cancelled"
+    started = time.monotonic()
     try:
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, "html.parser")
-        
+        with _session.get(url, headers=headers, timeout=host_health.timeout_for(url), stream=True) as response:
+            response.raise_for_status()
+
+            # Read the body in chunks so a cancelled run stops downloading
+            body = bytearray()
+            for chunk in response.iter_content(chunk_size=16384):
+                if cancel_event is not None and cancel_event.is_set():
+                    return f"Error scraping {url}: cancelled"
+                body.extend(chunk)
+                if len(body) >= MAX_DOWNLOAD_BYTES:
+                    break
+
+        soup = BeautifulSoup(bytes(body), "html.parser")
+
         # Remove script and style elements
         for script in soup(["script", "style", "nav", "footer"]):
             script.decompose()
-            
+
         text = soup.get_text(separator="\n")
-        
+
         # Clean up whitespace
         lines = (line.strip() for line in text.splitlines())
         chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
         text = '\n'.join(chunk for chunk in chunks if chunk)
-        
+
+        if looks_like_captcha(text):
+            host_health.record(url, ok=False, latency=time.monotonic() - started)
+            return f"Error scraping {url}: blocked by captcha or bot wall"
+        host_health.record(url, ok=True, latency=time.monotonic() - started)
+
         # Limit length to avoid context window issues
-        return text[:8000] 
-        
+        text = text[:8000]
+        storage.set(cache_key, text, ttl=PAGE_CACHE_TTL)
+        return text
+
     except Exception as e:
+        if is_host_failure(e):
+            host_health.record(url, ok=False, latency=time.monotonic() - started)
+        else:
+            host_health.record_page_miss(url)
         return f"Error scraping {url}: {str(e)}"
@@ -0,0 +1,131 @@
+import re
+import zlib
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# Any script: ranking's ASCII-only tokens would reduce non-English pages to nothing
+WORD_RE = re.compile(r"\w+")
+
+# Words per shingle; 5-word shingles ignore shared boilerplate phrases but match copied paragraphs
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 128
+# LSH bands x rows = NUM_PERMUTATIONS; 32 bands of 4 rows make nearly every pair above
+# 0.6 Jaccard a candidate, while unrelated pages rarely share a band
+LSH_BANDS = 32
+# Estimated Jaccard similarity of 5-word shingles at which two pages count as the same
+# content (a copy with ~3% of its words changed still scores above it)
+DUPLICATE_THRESHOLD = 0.7
+
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_SHIFT = np.uint64(32)
+_rng = np.random.RandomState(1)
+# One multiply-add-shift hash ((a * x + b) mod 2**64) >> 32 per permutation (a odd);
+# no modulo by a prime, so it stays in plain uint64 arithmetic. The fixed seed
+# keeps signatures comparable across processes.
+_PERM_A = _rng.randint(0, 1 << 63, size=NUM_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_PERM_B = _rng.randint(0, 1 << 63, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def shingle_hashes(text: str, k: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    32-bit hashes of the text's word k-shingles. Words are hashed once and
+    combined into shingle hashes with vectorized polynomial rolling. Empty
+    for a text without words.
+    """
+    words = WORD_RE.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    word_hashes = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.uint64, count=len(words))
+    if len(words) < k:
+        k = len(words)
+    n = len(words) - k + 1
+    combined = np.zeros(n, dtype=np.uint64)
+    for offset in range(k):
+        # uint64 arithmetic wraps, which is fine for hashing
+        combined = combined * np.uint64(1000003) + word_hashes[offset:offset + n]
+    return np.unique(combined & _MAX_HASH)
+
+
+def minhash_signatures(texts: Sequence[str], chunk_rows: int = 8192) -> np.ndarray:
+    """
+    MinHash signatures (len(texts) x NUM_PERMUTATIONS, uint64) for many texts.
+    A text without shingles keeps the all-maximum signature, which
+    cluster_duplicates never merges.
+
+    All shingles are concatenated and permuted in large row chunks, and the
+    per-text minima are taken with one `np.minimum.reduceat` per chunk, so the
+    cost is a few NumPy calls rather than a Python loop per shingle.
+    """
+    shingles = [shingle_hashes(text) for text in texts]
+    signatures = np.full((len(texts), NUM_PERMUTATIONS), _MAX_HASH, dtype=np.uint64)
+    if not shingles:
+        return signatures
+
+    all_shingles = np.concatenate(shingles)
+    owners = np.repeat(np.arange(len(texts)), [len(s) for s in shingles])
+    buffer = np.empty((min(chunk_rows, len(all_shingles)), NUM_PERMUTATIONS), dtype=np.uint64)
+    for start in range(0, len(all_shingles), chunk_rows):
+        block = all_shingles[start:start + chunk_rows]
+        block_owners = owners[start:start + chunk_rows]
+        # In place on a reused buffer; uint64 overflow is the intended mod 2**64
+        permuted = buffer[:len(block)]
+        np.multiply(block[:, None], _PERM_A, out=permuted)
+        permuted += _PERM_B
+        permuted >>= _SHIFT
+        # Rows are grouped by owner, so each owner's rows in this chunk are contiguous
+        boundaries = np.flatnonzero(np.r_[True, block_owners[1:] != block_owners[:-1]])
+        minima = np.minimum.reduceat(permuted, boundaries, axis=0)
+        ids = block_owners[boundaries]
+        signatures[ids] = np.minimum(signatures[ids], minima)
+    return signatures
+
+
+def estimated_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Fraction of equal MinHash values, an estimate of the shingle-set Jaccard similarity."""
+    return float(np.mean(a == b))
+
+
+def cluster_duplicates(signatures: np.ndarray, threshold: float = DUPLICATE_THRESHOLD,
+                       bands: int = LSH_BANDS) -> List[List[int]]:
+    """
+    Groups texts whose estimated similarity reaches `threshold`.
+
+    Candidate pairs come from LSH banding (texts sharing any band of their
+    signature) and are confirmed on the full signature; confirmed pairs are
+    merged with union-find. Returns clusters as lists of indices, in input
+    order, singletons included. Texts without shingles (all-maximum
+    signatures) stay singletons: identical signatures say nothing about them.
+    """
+    n = len(signatures)
+    parent = list(range(n))
+    empty = np.all(signatures == _MAX_HASH, axis=1) if n else []
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows = signatures.shape[1] // bands if n else 0
+    for band in range(bands if n > 1 else 0):
+        buckets: Dict[bytes, List[int]] = {}
+        band_slice = signatures[:, band * rows:(band + 1) * rows]
+        for i in range(n):
+            if not empty[i]:
+                buckets.setdefault(band_slice[i].tobytes(), []).append(i)
+        for members in buckets.values():
+            for other in members[1:]:
+                a, b = find(members[0]), find(other)
+                if a != b and estimated_similarity(signatures[members[0]], signatures[other]) >= threshold:
+                    parent[b] = a
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(n):
+        clusters.setdefault(find(i), []).append(i)
+    return sorted(clusters.values(), key=lambda members: members[0])
+
+
+def find_near_duplicates(texts: Sequence[str], threshold: float = DUPLICATE_THRESHOLD) -> List[List[int]]:
+    """Clusters of near-duplicate texts (see cluster_duplicates)."""
+    return cluster_duplicates(minhash_signatures(texts), threshold)
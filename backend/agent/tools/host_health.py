@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+# Page fragments that mean we got a bot wall instead of content
+CAPTCHA_MARKERS = (
+    "captcha",
+    "are you a robot",
+    "verify you are human",
+    "attention required! | cloudflare",
+    "just a moment...",
+    "access denied",
+)
+
+
+def host_of(url: str) -> str:
+    try:
+        host = urlsplit(url).netloc.lower()
+    except ValueError:
+        return ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def looks_like_captcha(text: str) -> bool:
+    """Bot walls are short pages mentioning one of the usual challenge phrases."""
+    if len(text) > 3000:
+        return False
+    lowered = text.lower()
+    return any(marker in lowered for marker in CAPTCHA_MARKERS)
+
+
+class HostStats:
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)  # (ok, latency_seconds)
+        self.open_until = 0.0
+        self.next_slot = 0.0
+        self.probing = False  # A half-open probe request is in flight
+
+    def success_rate(self) -> float:
+        if not self.samples:
+            return 1.0
+        return sum(1 for ok, _ in self.samples if ok) / len(self.samples)
+
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        latencies = sorted(latency for ok, latency in self.samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(pct / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+
+class HostHealthRegistry:
+    """
+    Tracks scrape outcomes per host and decides how to treat each host.
+
+    - Circuit breaker: once a host has at least `min_samples` outcomes and its
+      rolling success rate drops below `min_success_rate`, it is skipped for
+      `cooldown` seconds. After the cooldown one request is let through again
+      (half-open); a failure re-opens the circuit.
+    - Adaptive timeout: 2x the observed p95 latency of successful fetches,
+      clamped to [min_timeout, max_timeout].
+    - Politeness: requests to the same host are spaced `min_interval` seconds apart.
+    """
+
+    def __init__(self, window: int = 20, min_samples: int = 3, min_success_rate: float = 0.5,
+                 cooldown: float = 600, min_timeout: float = 3, max_timeout: float = 10,
+                 min_interval: float = 1.0):
+        self.window = window
+        self.min_samples = min_samples
+        self.min_success_rate = min_success_rate
+        self.cooldown = cooldown
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, HostStats] = {}
+
+    @classmethod
+    def from_env(cls) -> "HostHealthRegistry":
+        return cls(
+            cooldown=float(os.getenv("HOST_BREAKER_COOLDOWN", "600")),
+            max_timeout=float(os.getenv("SCRAPE_MAX_TIMEOUT", "10")),
+            min_interval=float(os.getenv("HOST_MIN_INTERVAL", "1.0")),
+        )
+
+    def _stats(self, host: str) -> HostStats:
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = HostStats(self.window)
+        return stats
+
+    def circuit_open(self, url: str) -> bool:
+        """True while the host is being skipped. Read-only: never claims the probe slot."""
+        with self._lock:
+            stats = self._hosts.get(host_of(url))
+            return stats is not None and stats.open_until > time.time()
+
+    def is_available(self, url: str) -> bool:
+        """
+        False while the host's circuit breaker is open. The first caller after
+        the cooldown gets the single half-open probe slot; the circuit stays
+        closed to everyone else until that probe is recorded (or, if it never
+        is, until the probe's timeout has passed and the next caller probes).
+        """
+        with self._lock:
+            stats = self._hosts.get(host_of(url))
+            if stats is None or not stats.open_until:
+                return True
+            now = time.time()
+            if stats.open_until > now:
+                return False
+            stats.probing = True
+            # Waiting for the host's turn plus the fetch itself
+            stats.open_until = now + 2 * self.max_timeout
+            return True
+
+    def success_rate(self, url: str) -> float:
+        """Rolling success rate for the host (1.0 for hosts we haven't seen)."""
+        with self._lock:
+            stats = self._hosts.get(host_of(url))
+            return stats.success_rate() if stats else 1.0
+
+    def timeout_for(self, url: str) -> float:
+        with self._lock:
+            stats = self._hosts.get(host_of(url))
+            p95 = stats.latency_percentile(95) if stats else None
+        if p95 is None:
+            return self.max_timeout
+        return max(self.min_timeout, min(self.max_timeout, p95 * 2))
+
+    def wait_turn(self, url: str, cancel_event=None):
+        """
+        Blocks until this host may be contacted again. Slots are reserved under
+        the lock and slept outside it, so different hosts never wait on each other.
+        """
+        with self._lock:
+            stats = self._stats(host_of(url))
+            now = time.monotonic()
+            slot = max(now, stats.next_slot)
+            stats.next_slot = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            if cancel_event is not None:
+                cancel_event.wait(delay)
+            else:
+                time.sleep(delay)
+
+    def record(self, url: str, ok: bool, latency: float):
+        with self._lock:
+            stats = self._stats(host_of(url))
+            if ok and stats.probing:
+                # The host recovered: judge it on a fresh window, not the failures that opened the circuit
+                stats.samples.clear()
+            stats.samples.append((ok, latency))
+            if ok:
+                stats.open_until = 0.0
+                stats.probing = False
+                return
+            failing = (len(stats.samples) >= self.min_samples
+                       and stats.success_rate() < self.min_success_rate)
+            if stats.probing or failing:
+                stats.probing = False
+                stats.open_until = time.time() + self.cooldown
+
+    def record_page_miss(self, url: str):
+        """
+        The host answered, but this page is gone (404, 410, ...). Not a host
+        failure, so no sample is added; a half-open probe ends as a success.
+        """
+        with self._lock:
+            stats = self._hosts.get(host_of(url))
+            if stats is not None and stats.probing:
+                stats.samples.clear()
+                stats.open_until = 0.0
+                stats.probing = False
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {
+                    "host": host,
+                    "samples": len(stats.samples),
+                    "success_rate": round(stats.success_rate(), 2),
+                    "p95_latency": stats.latency_percentile(95),
+                    "circuit_open": stats.open_until > time.time(),
+                }
+                for host, stats in self._hosts.items()
+            ]
+
+
+host_health = HostHealthRegistry.from_env()
+
+
+def interleave_by_host(results: List[Dict]) -> List[Dict]:
+    """
+    Reorders results round-robin by host (keeping each host's relative order)
+    so consecutive scrapes rarely hit the same host.
+    """
+    queues: Dict[str, deque] = {}
+    for result in results:
+        queues.setdefault(host_of(result.get("link", "")), deque()).append(result)
+    ordered = []
+    while queues:
+        for host in list(queues):
+            ordered.append(queues[host].popleft())
+            if not queues[host]:
+                del queues[host]
+    return ordered
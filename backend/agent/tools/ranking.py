@@ -0,0 +1,104 @@
+import math
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from agent.tools.host_health import host_of
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where", "which",
+    "who", "why", "will", "with", "vs", "about", "into", "its", "your", "you",
+}
+
+# Unicode word characters, so non-English topics and pages rank too
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def bm25_scores(documents: List[List[str]], query: List[str], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """
+    Okapi BM25 of each tokenized document against the query terms.
+    Repeated query terms weigh more (topic words appear in most queries).
+    """
+    if not documents:
+        return []
+    n = len(documents)
+    avg_len = sum(len(doc) for doc in documents) / n or 1.0
+    doc_freq = Counter(term for doc in documents for term in set(doc))
+    query_weights = Counter(query)
+
+    scores = []
+    for doc in documents:
+        freqs = Counter(doc)
+        norm = k1 * (1 - b + b * len(doc) / avg_len)
+        score = 0.0
+        for term, weight in query_weights.items():
+            tf = freqs.get(term)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            score += weight * idf * tf * (k1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+def rank_results(results: List[Dict], topic: str, queries: List[str],
+                 host_prior: Optional[Callable[[str], float]] = None,
+                 domain_decay: float = 0.5) -> List[Tuple[Dict, float]]:
+    """
+    Orders search results by expected value of scraping them.
+
+    - Relevance: BM25 of title + snippet against the topic and search queries,
+      normalized to [0, 1].
+    - Host prior: multiplied by 0.5 + 0.5 * host success rate, so hosts that
+      keep failing sink.
+    - Diversity: greedy selection where each pick from a domain multiplies the
+      remaining results of that domain by `domain_decay`.
+
+    Returns (result, score) pairs, best first; scores are the adjusted values
+    at the time each result was picked.
+    """
+    results = [r for r in results if r.get("link")]
+    if not results:
+        return []
+
+    query = tokenize(topic) * 2 + [t for q in queries for t in tokenize(q)]
+    documents = [tokenize(f"{r.get('title', '')} {r.get('snippet', '')}") for r in results]
+    relevance = bm25_scores(documents, query)
+    top = max(relevance) or 1.0
+
+    base = []
+    for result, score in zip(results, relevance):
+        prior = 0.5 + 0.5 * host_prior(result["link"]) if host_prior else 1.0
+        base.append((score / top) * prior)
+
+    ranked = []
+    remaining = list(range(len(results)))
+    picked_per_domain: Counter = Counter()
+    while remaining:
+        best = max(
+            remaining,
+            key=lambda i: base[i] * domain_decay ** picked_per_domain[host_of(results[i]["link"])]
+        )
+        domain = host_of(results[best]["link"])
+        ranked.append((results[best], round(base[best] * domain_decay ** picked_per_domain[domain], 4)))
+        picked_per_domain[domain] += 1
+        remaining.remove(best)
+    return ranked
+
+
+def choose_scrape_count(scores: List[float], min_count: int = 5, max_count: int = 15,
+                        relative_cutoff: float = 0.35) -> int:
+    """
+    Scrapes everything scoring at least `relative_cutoff` of the best result,
+    but never fewer than `min_count` or more than `max_count` pages.
+    """
+    if not scores:
+        return 0
+    cutoff = scores[0] * relative_cutoff
+    count = sum(1 for score in scores if score >= cutoff)
+    return max(min(min_count, len(scores)), min(count, max_count))
@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+from agent.tools.search import normalize_query, perform_search
+from agent.tools.browser import canonicalize_url, scrape_url
+
+def get_shared_work(config):
+    """
+    Returns the SharedWork instance threaded through the graph config, if any.
+    """
+    if not config:
+        return None
+    return config.get("configurable", {}).get("shared_work")
+
+
+class SharedWork:
+    """
+    Deduplicates search and scrape work across concurrent graph runs.
+
+    Identical queries and canonical URLs are executed once; concurrent callers
+    wait on the same in-flight future and later callers reuse the result.
+    Semaphores bound how many searches and scrapes hit the network at once,
+    so throughput scales with these limits rather than with the number of runs.
+    """
+
+    def __init__(self, max_concurrent_searches: int = 4, max_concurrent_scrapes: int = 8):
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self._search_slots = threading.BoundedSemaphore(max_concurrent_searches)
+        self._scrape_slots = threading.BoundedSemaphore(max_concurrent_scrapes)
+        self.stats = {"search_requests": 0, "search_hits": 0, "scrape_requests": 0, "scrape_hits": 0}
+
+    def search(self, query: str) -> List[Dict]:
+        return self._memo(
+            "search", f"search::{normalize_query(query)}",
+            lambda: perform_search(query), self._search_slots
+        )
+
+    def scrape(self, url: str, cancel_event=None) -> str:
+        return self._memo(
+            "scrape", f"scrape::{canonicalize_url(url)}",
+            lambda: scrape_url(url, cancel_event=cancel_event), self._scrape_slots
+        )
+
+    def _memo(self, kind: str, key: str, fn: Callable, slots: threading.BoundedSemaphore):
+        with self._lock:
+            self.stats[f"{kind}_requests"] += 1
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._futures[key] = future
+            else:
+                self.stats[f"{kind}_hits"] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            with slots:
+                result = fn()
+        except BaseException as e:
+            # Don't poison the cache with a failure (e.g. a cancelled run)
+            with self._lock:
+                self._futures.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        future.set_result(result)
+        return result
@@ -1,16 +1,39 @@
-from langchain_community.tools import DuckDuckGoSearchResults
 from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
 import json
+import os
+from functools import lru_cache
 
 from typing import List, Dict
 
+from agent.utils.storage import get_storage
+
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "21600"))
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+@lru_cache(maxsize=8)
+def get_search_wrapper(max_results=20) -> DuckDuckGoSearchAPIWrapper:
+    """Search wrappers are built once per result size and reused across calls."""
+    return DuckDuckGoSearchAPIWrapper(max_results=max_results)
+
 def perform_search(query: str, max_results=20) -> List[Dict]:
     """
     Executes a search using DuckDuckGo and returns the results as a list of dictionaries.
+    Results are cached in the shared storage so every worker reuses them.
     """
-    wrapper = DuckDuckGoSearchAPIWrapper(max_results=max_results)
+    storage = get_storage()
+    cache_key = f"search:{max_results}:{normalize_query(query)}"
+    cached = storage.get(cache_key)
+    if cached is not None:
+        return cached
+
+    wrapper = get_search_wrapper(max_results)
     try:
-        return wrapper.results(query, max_results=max_results)
+        results = wrapper.results(query, max_results=max_results)
+        if results:
+            storage.set(cache_key, results, ttl=SEARCH_CACHE_TTL)
+        return results
     except Exception as e:
         print(f"Search error for '{query}': {str(e)}")
         return []
@@ -0,0 +1,33 @@
+import threading
+from typing import Optional
+
+
+class ResearchCancelled(BaseException):
+    """
+    Raised inside a node when the client that started the run has gone away.
+    Derives from BaseException (like asyncio.CancelledError) so the broad
+    `except Exception` fallbacks in the nodes don't swallow it.
+    """
+
+
+def get_cancel_event(config) -> Optional[threading.Event]:
+    """
+    Returns the cancellation event threaded through the graph config, if any.
+    """
+    if not config:
+        return None
+    return config.get("configurable", {}).get("cancel_event")
+
+
+def is_cancelled(config) -> bool:
+    event = get_cancel_event(config)
+    return event is not None and event.is_set()
+
+
+def raise_if_cancelled(config):
+    """
+    Cooperative cancellation point. Nodes call this before any expensive
+    work (LLM calls, searches, scrapes) so a disconnected client stops the run.
+    """
+    if is_cancelled(config):
+        raise ResearchCancelled("Research run cancelled by client")
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+SPILL_THRESHOLD_BYTES = int(os.getenv("CONTENT_STORE_SPILL_BYTES", str(512 * 1024)))
+
+
+class ContentStore:
+    """
+    Per-session store for bulky text (scraped pages, formatted evidence).
+
+    Graph state only carries the returned content IDs (content hashes), so the
+    text is held once no matter how many state snapshots reference it.
+    Once the in-memory total exceeds `spill_threshold` bytes, new entries
+    (memoized blocks included) are written to a per-session temp directory and
+    read back on demand.
+    Entries are dropped with `release` once they have been analyzed, and
+    `close` removes everything.
+    """
+
+    def __init__(self, spill_threshold: int = SPILL_THRESHOLD_BYTES):
+        self.spill_threshold = spill_threshold
+        self._lock = threading.Lock()
+        self._memory: Dict[str, str] = {}
+        self._spilled: Dict[str, str] = {}  # content id -> file path
+        self._memory_bytes = 0
+        self._spill_dir: Optional[str] = None
+
+    @staticmethod
+    def content_id(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._memory_bytes
+
+    def put(self, text: str) -> str:
+        content_id = self.content_id(text)
+        with self._lock:
+            self._store(content_id, text)
+        return content_id
+
+    def _store(self, key: str, text: str):
+        """Keeps `text` in memory, or spills it once over the threshold. Caller holds the lock."""
+        if key in self._memory or key in self._spilled:
+            return
+        size = len(text.encode("utf-8"))
+        if self._memory_bytes + size <= self.spill_threshold:
+            self._memory[key] = text
+            self._memory_bytes += size
+            return
+
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="dra-session-")
+        # Memo keys aren't file names; hash them like content
+        path = os.path.join(self._spill_dir, self.content_id(key))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        self._spilled[key] = path
+
+    def get(self, content_id: str) -> Optional[str]:
+        """Returns the text, or None if it was released."""
+        with self._lock:
+            text = self._memory.get(content_id)
+            path = self._spilled.get(content_id)
+        if text is not None:
+            return text
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def memo(self, key: str, build: Callable[[], str]) -> str:
+        """
+        Returns the text stored under a derived key, building it once. Used for
+        prompt blocks that several nodes would otherwise format separately.
+        Stored like `put`, so large blocks spill instead of staying in memory.
+        """
+        text = self.get(key)
+        if text is None:
+            text = build()
+            with self._lock:
+                self._store(key, text)
+        return text
+
+    def release(self, content_ids: Iterable[str]):
+        with self._lock:
+            for content_id in content_ids:
+                text = self._memory.pop(content_id, None)
+                if text is not None:
+                    self._memory_bytes -= len(text.encode("utf-8"))
+                path = self._spilled.pop(content_id, None)
+                if path is not None:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def release_memos(self, prefix: str):
+        """Drops every memoized block whose key starts with `prefix`."""
+        with self._lock:
+            keys = [key for key in (*self._memory, *self._spilled) if key.startswith(prefix)]
+        self.release(keys)
+
+    def close(self):
+        with self._lock:
+            self._memory.clear()
+            self._spilled.clear()
+            self._memory_bytes = 0
+            spill_dir, self._spill_dir = self._spill_dir, None
+        if spill_dir:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+# Used when the graph is invoked without a per-run store in its config (e.g. the CLI)
+_default_store = ContentStore()
+
+
+def get_content_store(config) -> ContentStore:
+    """
+    Returns the per-run ContentStore threaded through the graph config.
+    """
+    store = None
+    if config:
+        store = config.get("configurable", {}).get("content_store")
+    return store or _default_store
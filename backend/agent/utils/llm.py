@@ -1,24 +1,95 @@
+import hashlib
 import os
+from functools import lru_cache
+from typing import Any, Optional
 from langchain_openai import ChatOpenAI
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, Generation
 from dotenv import load_dotenv
 
+from agent.utils.storage import get_storage
+
 load_dotenv()
 
-def get_llm(model_name="openai/gpt-4o-mini", max_tokens=2000):
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+
+# The only classes a cached response deserializes into; anything else in an entry is rejected
+CACHED_GENERATION_CLASSES = [Generation, ChatGeneration, ChatGenerationChunk, AIMessage, AIMessageChunk]
+
+
+class StorageLLMCache(BaseCache):
+    """
+    LangChain LLM cache backed by the shared storage, so identical prompts
+    to the same model are answered once across all workers.
+
+    With `read=False` lookups always miss but responses are still stored;
+    runs that must produce a fresh report (bypass_cache, background refresh)
+    use it so they don't replay the responses behind the cached report.
+    """
+
+    def __init__(self, ttl: float = LLM_CACHE_TTL, read: bool = True):
+        self.ttl = ttl
+        self.read = read
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        digest = hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+        return f"llm:{digest}"
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Any]:
+        if not self.read:
+            return None
+        cached = get_storage().get(self._key(prompt, llm_string))
+        if cached is None:
+            return None
+        try:
+            generations = [loads(generation, allowed_objects=CACHED_GENERATION_CLASSES) for generation in cached]
+        except Exception as e:
+            print(f"Ignoring unreadable LLM cache entry: {e}")
+            return None
+        for generation in generations:
+            # Lets the router tell a replayed response from a paid call
+            message = getattr(generation, "message", None)
+            if message is not None:
+                message.response_metadata["cache_hit"] = True
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: Any) -> None:
+        get_storage().set(
+            self._key(prompt, llm_string),
+            [dumps(generation) for generation in return_val],
+            ttl=self.ttl
+        )
+
+    def clear(self, **kwargs: Any) -> None:
+        # Entries expire through their TTL; the shared store is not wiped from here
+        pass
+
+_llm_cache = StorageLLMCache() if LLM_CACHE_TTL > 0 else None
+_llm_refresh_cache = StorageLLMCache(read=False) if LLM_CACHE_TTL > 0 else None
+
+@lru_cache(maxsize=32)
+def get_llm(model_name="openai/gpt-4o-mini", max_tokens=2000, use_cache=True):
     """
     Returns a configured ChatOpenAI instance.
     Defaults to openai/gpt-4o-mini for cost efficiency, but can be configured.
+    Responses are cached in the shared storage unless LLM_CACHE_TTL=0; with
+    use_cache=False cached responses are not served, only refreshed.
+    Instances (and their HTTP connection pools) are reused per model, max_tokens and cache mode.
     """
     api_key = os.getenv("OPENROUTER_API_KEY")
     if not api_key:
         print("Warning: OPENROUTER_API_KEY not found in environment variables.")
-    
+
     return ChatOpenAI(
         model=model_name,
         temperature=0.3,
         api_key=api_key,
         base_url="https://openrouter.ai/api/v1",
         max_tokens=max_tokens,
+        cache=_llm_cache if use_cache else _llm_refresh_cache,
         default_headers={
             "HTTP-Referer": "http://localhost:8000",
             "X-Title": "Deep Research Agent"
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import re
+import time
+from typing import Dict, Optional, Tuple
+
+from agent.utils.storage import Storage, get_storage
+
+FRESH = "fresh"
+STALE = "stale"
+
+# How often a worker checks on a run that another worker has claimed
+JOB_POLL_INTERVAL = 2.0
+
+
+def normalize_topic(topic: str) -> str:
+    """
+    Normalizes a topic so trivially different spellings share a cache entry.
+    """
+    topic = topic.strip().lower()
+    topic = re.sub(r"\s+", " ", topic)
+    return topic.strip(" .?!")
+
+
+def make_cache_key(topic: str, model: str) -> str:
+    return f"{model}::{normalize_topic(topic)}"
+
+
+class ReportCache:
+    """
+    Report cache with stale-while-revalidate semantics, kept in the shared storage.
+
+    - Entries younger than `ttl` seconds are fresh and served as-is.
+    - Entries younger than `max_age` seconds are stale: served immediately
+      while the caller refreshes them in the background.
+    - Older entries are treated as misses.
+
+    Identical concurrent requests are coordinated at two levels: runs in this
+    process are tracked so clients can join them directly, and a `job:` claim
+    in the storage tells other workers that a run is already in progress.
+    `join_or_claim` and `check_remote` implement that protocol for callers on
+    the event loop (/research and batches).
+    """
+
+    def __init__(self, ttl: float = 3600, max_age: float = 86400, job_lease: float = 900,
+                 storage: Optional[Storage] = None):
+        self.ttl = ttl
+        self.max_age = max(max_age, ttl)
+        self.job_lease = job_lease
+        self._storage = storage
+        self._runs: Dict[str, object] = {}
+
+    @classmethod
+    def from_env(cls) -> "ReportCache":
+        return cls(
+            ttl=float(os.getenv("REPORT_CACHE_TTL", "3600")),
+            max_age=float(os.getenv("REPORT_CACHE_MAX_AGE", "86400")),
+            job_lease=float(os.getenv("REPORT_JOB_LEASE", "900")),
+        )
+
+    @property
+    def storage(self) -> Storage:
+        return self._storage or get_storage()
+
+    def lookup(self, key: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Returns (report, status) where status is FRESH, STALE or None on a miss.
+        """
+        entry = self.storage.get(f"report:{key}")
+        if entry is None:
+            return None, None
+
+        age = time.time() - entry["stored_at"]
+        if age > self.max_age:
+            return None, None
+        return entry["report"], FRESH if age <= self.ttl else STALE
+
+    def stored_since(self, key: str, since: float) -> Optional[str]:
+        """Returns the cached report only if it was written after `since`."""
+        entry = self.storage.get(f"report:{key}")
+        if entry is None or entry["stored_at"] < since:
+            return None
+        return entry["report"]
+
+    def store(self, key: str, report: str):
+        self.storage.set(f"report:{key}", {"report": report, "stored_at": time.time()}, ttl=self.max_age)
+
+    def invalidate(self, key: str):
+        self.storage.delete(f"report:{key}")
+
+    # --- Cross-worker job claims ---
+
+    def claim(self, key: str) -> bool:
+        """Claims the right to run research for this key. False if another worker holds it."""
+        return self.storage.add(f"job:{key}", {"pid": os.getpid(), "started_at": time.time()}, ttl=self.job_lease)
+
+    def is_claimed(self, key: str) -> bool:
+        return self.storage.get(f"job:{key}") is not None
+
+    def release(self, key: str):
+        self.storage.delete(f"job:{key}")
+
+    # --- In-process single-flight tracking ---
+
+    def get_run(self, key: str):
+        """Returns the in-progress run for this key, if one is still usable."""
+        run = self._runs.get(key)
+        if run is None or run.done or run.cancel_event.is_set():
+            return None
+        return run
+
+    async def join_or_claim(self, key: str) -> Tuple[Optional[object], bool]:
+        """
+        Single-flight entry for a key that has to be researched. Returns
+        (run, False) to join a run in progress in this process, (None, True)
+        if the caller now holds the claim and must start the run, or
+        (None, False) if another worker holds it (poll `check_remote`).
+        """
+        run = self.get_run(key)
+        if run is not None:
+            return run, False
+        # Storage calls can block (SQLite busy timeout, Redis round trips), so keep them off the loop
+        claimed = await asyncio.to_thread(self.claim, key)
+        # A concurrent request in this process may have started the run meanwhile
+        run = self.get_run(key)
+        if run is not None:
+            return run, False
+        return None, claimed
+
+    async def check_remote(self, key: str, since: float) -> Tuple[Optional[str], bool]:
+        """
+        Checks once on a run claimed by another worker. Returns (report, _) once
+        its report is stored, (None, True) while the claim is still held, and
+        (None, False) if that worker let it go without a report: the caller
+        then goes back to `join_or_claim`. Callers poll every JOB_POLL_INTERVAL.
+        """
+        report = await asyncio.to_thread(self.stored_since, key, since)
+        if report is not None:
+            return report, True
+        return None, await asyncio.to_thread(self.is_claimed, key)
+
+    def track_run(self, key: str, run):
+        """Registers a run started under a claim; the claim is released when it ends."""
+        self._runs[key] = run
+
+        def _forget(finished_run):
+            if self._runs.get(key) is finished_run:
+                del self._runs[key]
+            # Runs on the event loop; the storage write must not block it
+            asyncio.get_running_loop().run_in_executor(None, self.release, key)
+
+        run.add_done_callback(_forget)
@@ -0,0 +1,272 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# USD per 1M (input, output) tokens on OpenRouter; override with MODEL_PRICES='{"model": [in, out]}'
+DEFAULT_PRICES = {
+    "anthropic/claude-3.5-sonnet": (3.00, 15.00),
+    "openai/gpt-4o": (2.50, 10.00),
+    "openai/gpt-4o-mini": (0.15, 0.60),
+}
+UNKNOWN_MODEL_PRICE = (1.00, 3.00)
+
+# Trivial JSON planning and yes/no review don't need the requested (possibly premium) model
+DEFAULT_ROUTES = {
+    "planner": "openai/gpt-4o-mini",
+    "review": "openai/gpt-4o-mini",
+    "analysis": "default",
+    "writer": "default",
+}
+
+NODE_ROLES = {
+    "planner": "planner",
+    "review": "review",
+    "analyze_facts": "analysis",
+    "analyze_trends": "analysis",
+    "analyze_insights": "analysis",
+    "research": "analysis",
+    "writer": "writer",
+    "writer_outline": "writer",
+    "writer_section": "writer",
+    "writer_merge": "review",
+    "followup_planner": "planner",
+    "analyze_followup": "analysis",
+    "revise": "writer",
+}
+
+# Latency model before a model has been observed: fixed overhead + per output token
+DEFAULT_LATENCY_OVERHEAD = 1.5
+DEFAULT_SECONDS_PER_TOKEN = 0.02
+
+
+def _load_prices() -> Dict[str, Tuple[float, float]]:
+    prices = dict(DEFAULT_PRICES)
+    override = os.getenv("MODEL_PRICES")
+    if override:
+        try:
+            prices.update({model: tuple(pair) for model, pair in json.loads(override).items()})
+        except (ValueError, TypeError) as e:
+            print(f"Ignoring invalid MODEL_PRICES: {e}")
+    return prices
+
+
+def _load_routes() -> Dict[str, str]:
+    """MODEL_ROUTES='planner=openai/gpt-4o-mini,writer=default' ('default' = the requested model)."""
+    routes = dict(DEFAULT_ROUTES)
+    for pair in filter(None, os.getenv("MODEL_ROUTES", "").split(",")):
+        role, _, model = pair.partition("=")
+        if role.strip() and model.strip():
+            routes[role.strip()] = model.strip()
+    return routes
+
+
+def _estimate_tokens(messages) -> int:
+    # ~4 characters per token is close enough for budgeting
+    return sum(len(getattr(m, "content", "") or "") for m in messages) // 4 + 1
+
+
+class ModelRouter:
+    """
+    Picks a model per node role and keeps a run within its cost and latency budgets.
+
+    Before each call the router estimates its cost (prompt tokens plus the full
+    max_tokens of output) and latency. If that would push the run past
+    `max_cost_usd` or `max_latency_s`, it downgrades to the next cheaper model
+    that fits; if none fits, it uses the cheapest model and, for latency,
+    shrinks max_tokens. Actual usage is recorded per node for the final report.
+    """
+
+    def __init__(self, max_cost_usd: Optional[float] = None, max_latency_s: Optional[float] = None,
+                 routes: Optional[Dict[str, str]] = None, prices: Optional[Dict[str, Tuple[float, float]]] = None,
+                 keep_calls: bool = True):
+        self.max_cost_usd = max_cost_usd
+        self.max_latency_s = max_latency_s
+        self.routes = routes or _load_routes()
+        self.prices = prices or _load_prices()
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._spent = 0.0
+        self._reserved = 0.0
+        self._latency: Dict[str, Tuple[float, float]] = {}  # model -> (overhead, seconds per output token)
+        self.keep_calls = keep_calls
+        self.calls: List[Dict] = []
+
+    @classmethod
+    def from_env(cls, max_cost_usd: Optional[float] = None, max_latency_s: Optional[float] = None) -> "ModelRouter":
+        if max_cost_usd is None and os.getenv("RUN_MAX_COST_USD"):
+            max_cost_usd = float(os.getenv("RUN_MAX_COST_USD"))
+        if max_latency_s is None and os.getenv("RUN_MAX_LATENCY_S"):
+            max_latency_s = float(os.getenv("RUN_MAX_LATENCY_S"))
+        return cls(max_cost_usd=max_cost_usd, max_latency_s=max_latency_s)
+
+    def price(self, model: str) -> Tuple[float, float]:
+        return self.prices.get(model, UNKNOWN_MODEL_PRICE)
+
+    def estimate_cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
+        price_in, price_out = self.price(model)
+        return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+    def estimate_latency(self, model: str, output_tokens: int) -> float:
+        overhead, per_token = self._latency.get(model, (DEFAULT_LATENCY_OVERHEAD, DEFAULT_SECONDS_PER_TOKEN))
+        return overhead + per_token * output_tokens
+
+    def _cheaper_models(self, model: str) -> List[str]:
+        """Known models cheaper than `model`, closest in price first."""
+        current = sum(self.price(model))
+        cheaper = [m for m in self.prices if sum(self.price(m)) < current]
+        return sorted(cheaper, key=lambda m: -sum(self.price(m)))
+
+    def route(self, node: str, requested_model: str) -> str:
+        route = self.routes.get(NODE_ROLES.get(node, "analysis"), "default")
+        return requested_model if route == "default" else route
+
+    def choose(self, node: str, requested_model: str, messages, max_tokens: int) -> Tuple[str, int, Optional[str]]:
+        """
+        Returns (model, max_tokens, downgrade_reason) for the next call of `node`.
+        The estimated cost is reserved until `record` settles it.
+        """
+        model = self.route(node, requested_model)
+        input_tokens = _estimate_tokens(messages)
+        reason = None
+
+        with self._lock:
+            committed = self._spent + self._reserved
+            remaining_cost = None if self.max_cost_usd is None else self.max_cost_usd - committed
+            remaining_time = None if self.max_latency_s is None else self.max_latency_s - (time.monotonic() - self.started)
+
+            def fits(candidate: str, tokens: int) -> bool:
+                if remaining_cost is not None and self.estimate_cost(candidate, input_tokens, tokens) > remaining_cost:
+                    return False
+                if remaining_time is not None and self.estimate_latency(candidate, tokens) > remaining_time:
+                    return False
+                return True
+
+            if not fits(model, max_tokens):
+                options = [m for m in self._cheaper_models(model) if fits(m, max_tokens)]
+                downgraded = options[0] if options else (self._cheaper_models(model) or [model])[-1]
+                reason = "cost budget" if remaining_cost is not None and \
+                    self.estimate_cost(model, input_tokens, max_tokens) > remaining_cost else "latency budget"
+                if not options and remaining_time is not None:
+                    # Still too slow: shorten the answer to what fits the remaining time
+                    overhead, per_token = self._latency.get(downgraded, (DEFAULT_LATENCY_OVERHEAD, DEFAULT_SECONDS_PER_TOKEN))
+                    max_tokens = max(300, min(max_tokens, int((remaining_time - overhead) / (per_token or DEFAULT_SECONDS_PER_TOKEN))))
+                print(f"Router: {node} downgraded {model} -> {downgraded} ({reason})")
+                model = downgraded
+
+            self._reserved += self.estimate_cost(model, input_tokens, max_tokens)
+        return model, max_tokens, reason
+
+    def record(self, node: str, model: str, reserved_cost: float, latency: float,
+               input_tokens: int, output_tokens: int, downgrade_reason: Optional[str] = None,
+               cached: bool = False):
+        """
+        Settles a call's reservation. Responses served from the LLM cache cost
+        nothing and say nothing about the model's speed, so they only release
+        the reservation.
+        """
+        cost = 0.0 if cached else self.estimate_cost(model, input_tokens, output_tokens)
+        with self._lock:
+            self._reserved = max(0.0, self._reserved - reserved_cost)
+            self._spent += cost
+            if output_tokens and not cached:
+                overhead = min(latency, DEFAULT_LATENCY_OVERHEAD)
+                per_token = max(0.0, latency - overhead) / output_tokens
+                previous = self._latency.get(model)
+                if previous:
+                    per_token = 0.7 * previous[1] + 0.3 * per_token
+                self._latency[model] = (overhead, per_token)
+            if not self.keep_calls:
+                return
+            self.calls.append({
+                "node": node,
+                "model": model,
+                "latency_s": round(latency, 2),
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "cost_usd": round(cost, 6),
+                "downgraded": downgrade_reason,
+                "cached": cached,
+            })
+
+    def report(self) -> Dict:
+        """Actual spend and latency per node for the end-of-run summary."""
+        with self._lock:
+            nodes: Dict[str, Dict] = {}
+            for call in self.calls:
+                entry = nodes.setdefault(
+                    call["node"], {"calls": 0, "cached_calls": 0, "models": [], "latency_s": 0.0, "cost_usd": 0.0}
+                )
+                entry["calls"] += 1
+                entry["cached_calls"] += call["cached"]
+                entry["latency_s"] = round(entry["latency_s"] + call["latency_s"], 2)
+                entry["cost_usd"] = round(entry["cost_usd"] + call["cost_usd"], 6)
+                if call["model"] not in entry["models"]:
+                    entry["models"].append(call["model"])
+            return {
+                "nodes": nodes,
+                "total_cost_usd": round(self._spent, 6),
+                "elapsed_s": round(time.monotonic() - self.started, 2),
+                "budgets": {"max_cost_usd": self.max_cost_usd, "max_latency_s": self.max_latency_s},
+                "downgrades": [c for c in self.calls if c["downgraded"]],
+            }
+
+
+class RoutedLLM:
+    """
+    Drop-in for the ChatOpenAI instances the nodes used to build: `invoke`
+    asks the router for a model at call time and records the actual usage.
+    """
+
+    def __init__(self, router: ModelRouter, node: str, requested_model: str, max_tokens: int,
+                 use_cache: bool = True):
+        self.router = router
+        self.node = node
+        self.requested_model = requested_model
+        self.max_tokens = max_tokens
+        self.use_cache = use_cache
+
+    def invoke(self, messages):
+        # Imported here so the API can build routers without loading langchain_openai
+        from agent.utils.llm import get_llm
+
+        model, max_tokens, reason = self.router.choose(self.node, self.requested_model, messages, self.max_tokens)
+        input_estimate = _estimate_tokens(messages)
+        reserved = self.router.estimate_cost(model, input_estimate, max_tokens)
+        started = time.monotonic()
+        try:
+            response = get_llm(model_name=model, max_tokens=max_tokens, use_cache=self.use_cache).invoke(messages)
+        except BaseException:
+            self.router.record(self.node, model, reserved, time.monotonic() - started, input_estimate, 0, reason)
+            raise
+
+        usage = getattr(response, "usage_metadata", None) or {}
+        self.router.record(
+            self.node, model, reserved, time.monotonic() - started,
+            usage.get("input_tokens", input_estimate),
+            usage.get("output_tokens", len(response.content or "") // 4),
+            reason,
+            cached=bool((getattr(response, "response_metadata", None) or {}).get("cache_hit"))
+        )
+        return response
+
+
+# Routing without budgets for runs that don't bring their own router (e.g. the CLI)
+_default_router = ModelRouter(keep_calls=False)
+
+
+def get_router(config) -> ModelRouter:
+    router = None
+    if config:
+        router = config.get("configurable", {}).get("router")
+    return router or _default_router
+
+
+def route_llm(config, node: str, requested_model: str, max_tokens: int = 2000) -> RoutedLLM:
+    """
+    Returns the LLM a node should call, routed per node role within the run's budgets.
+    Runs with `no_llm_cache` in their config don't get cached responses.
+    """
+    use_cache = not (config or {}).get("configurable", {}).get("no_llm_cache")
+    return RoutedLLM(get_router(config), node, requested_model, max_tokens, use_cache)
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from agent.state import apply_update
+from agent.utils.storage import Storage, get_storage
+
+# Most recent sources a follow-up reads back from the page cache as retained evidence
+SESSION_MAX_PAGES = 60
+
+
+def make_session_id(cache_key: Optional[str] = None) -> str:
+    """
+    Session of a full run: derived from its report cache key, so a cached
+    report still points at the session that produced it. Follow-ups get a
+    random ID.
+    """
+    if cache_key is None:
+        return uuid.uuid4().hex[:16]
+    return hashlib.sha1(cache_key.encode("utf-8")).hexdigest()[:16]
+
+
+class SessionStore:
+    """
+    Retains the outcome of finished runs (report, notes, sources)
+    so follow-up questions can extend a report without rerunning the pipeline.
+
+    Sessions are JSON documents under `session:{id}` in the shared storage, so
+    any worker can serve a follow-up. The TTL slides on every access and is the
+    only eviction: a per-worker LRU would delete sessions other workers are
+    still using. The storage backend's own size bound caps the total.
+    """
+
+    def __init__(self, ttl: float = 3600, storage: Optional[Storage] = None):
+        self.ttl = ttl
+        self._storage = storage
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        return cls(ttl=float(os.getenv("SESSION_TTL", "3600")))
+
+    @property
+    def storage(self) -> Storage:
+        return self._storage or get_storage()
+
+    def exists(self, session_id: str) -> bool:
+        """True if the session can still be followed up (doesn't extend its TTL)."""
+        return self.storage.get(f"session:{session_id}") is not None
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        session = self.storage.get(f"session:{session_id}")
+        if session is not None:
+            self.save(session_id, session)
+        return session
+
+    def save(self, session_id: str, session: Dict):
+        self.storage.set(f"session:{session_id}", session, ttl=self.ttl)
+
+
+class SessionRecorder:
+    """
+    Follows a run's state updates and saves what a follow-up needs as a session.
+
+    Only the sources are recorded, not their text: a follow-up reads the pages
+    it needs back from the page cache (`page:` keys), so neither the recorder
+    nor the saved session holds scraped text.
+    """
+
+    def __init__(self, store: SessionStore, session_id: str, initial_state: Dict,
+                 parent: Optional[Dict] = None):
+        self.store = store
+        self.session_id = session_id
+        self.state = dict(initial_state)
+        self.parent_id = parent["session_id"] if parent else None
+        self.queries: List[str] = list(parent["queries"]) if parent else []
+        self.followups: List[str] = list(parent["followups"]) if parent else []
+        if initial_state.get("followup"):
+            self.followups.append(initial_state["followup"])
+
+    def observe(self, update: Dict):
+        self.queries.extend(q for q in update.get("search_queries", []) if q not in self.queries)
+        apply_update(self.state, {k: v for k, v in update.items() if k != "scraped_refs"})
+
+    def snapshot(self) -> Dict:
+        return {
+            "session_id": self.session_id,
+            "parent_id": self.parent_id,
+            "topic": self.state["topic"],
+            "model": self.state.get("model"),
+            "report": self.state.get("report", ""),
+            "research_notes": self.state.get("research_notes", []),
+            "sources": self.state.get("scraped_urls", []),
+            "queries": self.queries,
+            "followups": self.followups,
+            "saved_at": time.time(),
+        }
+
+    def save(self):
+        self.store.save(self.session_id, self.snapshot())
+
+
+def get_retained_session(config) -> Optional[Dict]:
+    """Returns the session a follow-up run extends, threaded through the graph config."""
+    if not config:
+        return None
+    return config.get("configurable", {}).get("session")
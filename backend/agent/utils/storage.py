@@ -0,0 +1,279 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class Storage:
+    """
+    Minimal key/value store shared by the tools and the API.
+
+    Values must be JSON-serializable. Keys are namespaced by prefix
+    (`search:`, `page:`, `llm:`, `report:`, `job:`, `session:`) and hit/miss counts are
+    tracked per namespace. Backends implement `_get`, `_set`, `_add` and `_delete`.
+
+    Storage is a cache, so backend errors are logged and treated as misses
+    rather than failing the research run.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            value = self._get(key)
+        except Exception as e:
+            print(f"Storage error ({self.name}) reading {key}: {e}")
+            value = None
+        namespace = key.split(":", 1)[0]
+        with self._stats_lock:
+            counts = self.stats.setdefault(namespace, {"hits": 0, "misses": 0})
+            counts["hits" if value is not None else "misses"] += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Stores a value, expiring it after `ttl` seconds if given."""
+        try:
+            self._set(key, value, ttl)
+        except Exception as e:
+            print(f"Storage error ({self.name}) writing {key}: {e}")
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Stores a value only if the key is absent. Returns True if it was stored
+        (or if the backend is unavailable, so callers fall back to doing the work).
+        """
+        try:
+            return self._add(key, value, ttl)
+        except Exception as e:
+            print(f"Storage error ({self.name}) claiming {key}: {e}")
+            return True
+
+    def delete(self, key: str):
+        try:
+            self._delete(key)
+        except Exception as e:
+            print(f"Storage error ({self.name}) deleting {key}: {e}")
+
+    def _delete(self, key: str):
+        raise NotImplementedError
+
+    def _get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]):
+        raise NotImplementedError
+
+    def _add(self, key: str, value: Any, ttl: Optional[float]) -> bool:
+        raise NotImplementedError
+
+
+class MemoryStorage(Storage):
+    """
+    Process-local storage. Fastest, but every worker keeps its own copy.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10000):
+        super().__init__()
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def _live(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return entry
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def _set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def _add(self, key, value, ttl):
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            return True
+
+    def _delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SQLiteStorage(Storage):
+    """
+    Local SQLite storage shared by every worker process on the same host.
+
+    Uses WAL mode and one connection per thread; writes are single statements
+    or short transactions, so concurrent processes only wait on the busy timeout.
+
+    Expired rows are purged by writes at most once per `purge_interval` seconds,
+    which also drops the least recently written rows beyond `max_entries`.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = 100000, purge_interval: float = 60):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _purge(self, conn: sqlite3.Connection, now: float):
+        """Drops expired rows and, beyond max_entries, the oldest writes (lowest rowid)."""
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM kv WHERE rowid IN (SELECT rowid FROM kv ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def _set(self, key, value, ttl):
+        now = time.time()
+        with self._conn() as conn:
+            # REPLACE gives the row a new rowid, so rowid order is write order
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + ttl if ttl else None)
+            )
+            self._purge(conn, now)
+
+    def _add(self, key, value, ttl):
+        now = time.time()
+        # One transaction: drop an expired holder, then insert only if absent
+        with self._conn() as conn:
+            conn.execute("DELETE FROM kv WHERE key = ? AND expires_at IS NOT NULL AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + ttl if ttl else None)
+            )
+            added = cursor.rowcount == 1
+            self._purge(conn, now)
+            return added
+
+    def _delete(self, key):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+
+class RedisStorage(Storage):
+    """
+    Storage on any Redis-protocol server (Redis, Valkey, KeyDB, or a local
+    stand-in such as fakeredis passed in as `client`). Shared across hosts.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str = "redis://localhost:6379/0", client=None, prefix: str = "dra:"):
+        super().__init__()
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError("STORAGE_BACKEND=redis requires the 'redis' package (pip install redis)") from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def _set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def _add(self, key, value, ttl):
+        return bool(self.client.set(
+            self.prefix + key, json.dumps(value), px=int(ttl * 1000) if ttl else None, nx=True
+        ))
+
+    def _delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+_storage: Optional[Storage] = None
+_storage_lock = threading.Lock()
+
+
+def create_storage_from_env() -> Storage:
+    backend = os.getenv("STORAGE_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteStorage(
+            os.getenv("STORAGE_PATH", ".cache/research.sqlite3"),
+            max_entries=int(os.getenv("STORAGE_MAX_ENTRIES", "100000")),
+        )
+    if backend == "redis":
+        return RedisStorage(os.getenv("STORAGE_URL", "redis://localhost:6379/0"))
+    if backend != "memory":
+        print(f"Warning: unknown STORAGE_BACKEND '{backend}', falling back to memory")
+    return MemoryStorage(max_entries=int(os.getenv("STORAGE_MAX_ENTRIES", "10000")))
+
+
+def get_storage() -> Storage:
+    """
+    Returns the process-wide storage backend, configured via STORAGE_BACKEND.
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage_from_env()
+    return _storage
+
+
+def set_storage(storage: Optional[Storage]):
+    """Replaces the process-wide storage backend (None resets to the env default)."""
+    global _storage
+    with _storage_lock:
+        _storage = storage
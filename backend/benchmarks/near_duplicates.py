@@ -0,0 +1,105 @@
+"""
+Near-duplicate detection benchmark: MinHash signature throughput and clustering.
+
+Generates synthetic scraped pages (~2000 characters, what scrape_node keeps per
+page), a share of which are lightly edited copies of others (syndicated
+articles, mirrors). Then:
+
+- times signature computation with the batched NumPy path
+  (agent.tools.dedup.minhash_signatures) against a per-page pure-Python
+  MinHash on a sample, and
+- clusters the pages and reports how many planted copies were found and
+  how many distinct pages were wrongly merged.
+
+Exits non-zero if batched throughput is below --min-pages-per-sec, so it can
+be used as a budget check in CI.
+
+Usage (from the backend directory):
+    python benchmarks/near_duplicates.py [--pages 5000] [--duplicate-share 0.2] [--min-pages-per-sec 500]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.tools.dedup import (  # noqa: E402
+    NUM_PERMUTATIONS, SHINGLE_SIZE, WORD_RE, cluster_duplicates, minhash_signatures
+)
+
+PAGE_WORDS = 300  # ~2000 characters
+VOCABULARY = [f"term{i}" for i in range(20000)]
+
+
+def synthetic_pages(count: int, duplicate_share: float, edit_rate: float, seed: int = 0):
+    """Returns (pages, source) where source[i] is the original a planted copy was made from."""
+    rng = random.Random(seed)
+    pages, source = [], []
+    for i in range(count):
+        if pages and rng.random() < duplicate_share:
+            original = rng.randrange(len(pages))
+            words = pages[original].split()
+            for j in range(len(words)):
+                if rng.random() < edit_rate:
+                    words[j] = rng.choice(VOCABULARY)
+            pages.append(" ".join(words))
+            source.append(source[original])
+        else:
+            pages.append(" ".join(rng.choice(VOCABULARY) for _ in range(PAGE_WORDS)))
+            source.append(i)
+    return pages, source
+
+
+def python_minhash(text: str):
+    """Reference MinHash without NumPy: one Python hash per shingle and permutation."""
+    words = WORD_RE.findall(text.lower())
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    return [min(zlib.crc32(seed.to_bytes(4, "little"), h) for h in hashes) for seed in range(NUM_PERMUTATIONS)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--duplicate-share", type=float, default=0.2, help="share of pages that are edited copies")
+    parser.add_argument("--edit-rate", type=float, default=0.02, help="share of words changed in a copy")
+    parser.add_argument("--python-sample", type=int, default=100, help="pages timed with the pure-Python MinHash")
+    parser.add_argument("--min-pages-per-sec", type=float, default=500, help="fail below this batched throughput")
+    args = parser.parse_args()
+
+    pages, source = synthetic_pages(args.pages, args.duplicate_share, args.edit_rate)
+
+    started = time.perf_counter()
+    signatures = minhash_signatures(pages)
+    batched = time.perf_counter() - started
+
+    sample = pages[:args.python_sample]
+    started = time.perf_counter()
+    for page in sample:
+        python_minhash(page)
+    python_rate = len(sample) / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    clusters = cluster_duplicates(signatures)
+    clustering = time.perf_counter() - started
+
+    planted = sum(1 for i, s in enumerate(source) if s != i)
+    found = sum(len(cluster) - 1 for cluster in clusters)
+    false_merges = sum(len({source[i] for i in cluster}) - 1 for cluster in clusters)
+    batched_rate = len(pages) / batched
+
+    print(f"pages: {len(pages)} ({planted} planted near-duplicates, {args.edit_rate:.1%} of words edited)")
+    print(f"signatures, batched NumPy:  {batched_rate:10.0f} pages/s  ({batched:.2f}s)")
+    print(f"signatures, pure Python:    {python_rate:10.0f} pages/s  (sample of {len(sample)})")
+    print(f"clustering (LSH + verify):  {clustering:10.3f}s")
+    print(f"duplicates merged: {found - false_merges}/{planted} planted, {false_merges} distinct pages merged")
+    if batched_rate < args.min_pages_per_sec:
+        print("FAIL: signature throughput under budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Session memory benchmark: bulky text a research session keeps alive between nodes.
+
+Drives the real scrape_node, the three analysis nodes (and so format_evidence)
+and synthesize_parallel_node for several iterations, with scrape_url and the
+LLM stubbed out (synthetic ~2000-character pages, fixed-size analyses). After
+every node the traced memory still allocated (the state plus the session's
+ContentStore) is sampled, and the peak is reported for two flows:
+
+- before: what the graph did when page strings lived in state - nothing is
+  spilled to disk and nothing is released, so every page stays in memory for
+  the whole run, and
+- after: the per-run ContentStore as configured for the graph - pages above
+  the spill threshold go to temp files and are released after synthesis.
+
+Exits non-zero if the ContentStore flow keeps more than --max-kb alive, if the
+old flow stays under that budget (the budget would protect nothing), or if
+spilling did not work: each iteration must scrape more page text than
+--spill-kb, the spilled pages must not count towards the store's memory, and
+all pages must be gone once the iteration has been synthesized.
+
+Usage (from the backend directory):
+    python benchmarks/session_memory.py [--iterations 2] [--pages 15] [--spill-kb 16] [--max-kb 96]
+
+The same checks run under pytest with the default settings:
+    python -m pytest benchmarks/session_memory.py
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import string
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import agent.graph as graph  # noqa: E402
+from agent.state import apply_update, build_initial_state  # noqa: E402
+from agent.utils.content_store import ContentStore  # noqa: E402
+
+PAGE_CHARS = 2000  # scrape_node keeps the first 2000 characters of each page
+ANALYSIS_CHARS = 1500
+ANALYSIS_NODES = (graph.analyze_facts_node, graph.analyze_trends_node, graph.analyze_insights_node)
+
+
+class RetainingStore(ContentStore):
+    """The old behaviour: page text never spills and is never released."""
+
+    def __init__(self):
+        super().__init__(spill_threshold=float("inf"))
+
+    def release(self, content_ids):
+        pass
+
+
+class StubResponse:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class StubLLM:
+    def invoke(self, messages):
+        return StubResponse("x" * ANALYSIS_CHARS)
+
+
+def stub_scrape_url(url: str, cancel_event=None) -> str:
+    rng = random.Random(url)
+    return "".join(rng.choice(string.ascii_letters + " ") for _ in range(PAGE_CHARS))
+
+
+def synthetic_results(iteration: int, pages: int):
+    return [
+        {"title": f"Result {iteration}-{i}", "snippet": "market growth " * 10,
+         "link": f"https://example{i}.com/{iteration}"}
+        for i in range(pages)
+    ]
+
+
+def run_session(store: ContentStore, iterations: int, pages: int, checks=None) -> float:
+    """Runs the nodes and returns the peak KB still allocated after any node."""
+    config = {"configurable": {"content_store": store}}
+    state = build_initial_state("market growth", "stub-model")
+    baseline = tracemalloc.get_traced_memory()[0]
+    peak = 0
+
+    def step(node):
+        nonlocal peak
+        update = node(state, config)
+        apply_update(state, update)
+        peak = max(peak, tracemalloc.get_traced_memory()[0] - baseline)
+        return update
+
+    for iteration in range(iterations):
+        state["iteration"] = iteration
+        apply_update(state, {"search_results": synthetic_results(iteration, pages)})
+        refs = step(graph.scrape_node)["scraped_refs"]
+        if checks:
+            checks(store, refs, "scrape")
+        for node in ANALYSIS_NODES:
+            step(node)
+        step(graph.synthesize_parallel_node)
+        if checks:
+            checks(store, refs, "synthesize")
+    return peak / 1024
+
+
+def spill_checks(spill_threshold: int):
+    failures = []
+
+    def check(store: ContentStore, refs, after: str):
+        if after == "scrape":
+            total = sum(len(store.get(ref).encode("utf-8")) for ref in refs)
+            spilled = total - store.memory_bytes
+            if total <= spill_threshold:
+                failures.append(f"only {total} bytes of pages scraped; raise --pages or lower --spill-kb to exercise spilling")
+            elif spilled <= 0:
+                failures.append(f"{total} bytes of pages scraped but nothing spilled")
+            if store.memory_bytes > spill_threshold:
+                failures.append(f"store holds {store.memory_bytes} bytes, above the {spill_threshold} byte threshold")
+        elif store.memory_bytes or any(store.get(ref) is not None for ref in refs):
+            failures.append(f"{store.memory_bytes} bytes and some pages still held after synthesis")
+
+    return check, failures
+
+
+def traced(fn, *args):
+    tracemalloc.start()
+    try:
+        # The nodes log every step; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn(*args)
+    finally:
+        tracemalloc.stop()
+
+
+def measure(iterations: int = 2, pages: int = 15, spill_kb: int = 16, max_kb: float = 96):
+    """
+    Runs both flows through the real nodes (scraping and the LLM stubbed out)
+    and returns (before_kb, after_kb, failures).
+    """
+    originals = graph.scrape_url, graph.route_llm
+    graph.scrape_url = stub_scrape_url
+    graph.route_llm = lambda config, node, model, max_tokens=2000: StubLLM()
+    spill_threshold = spill_kb * 1024
+    try:
+        # Untraced warm-up, so lazy imports and first-call caches count against neither flow
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_session(ContentStore(), 1, pages)
+
+        before = traced(run_session, RetainingStore(), iterations, pages)
+        check, failures = spill_checks(spill_threshold)
+        store = ContentStore(spill_threshold=spill_threshold)
+        try:
+            after = traced(run_session, store, iterations, pages, check)
+        finally:
+            store.close()
+    finally:
+        graph.scrape_url, graph.route_llm = originals
+
+    if before <= max_kb:
+        failures.append("the old flow fits the budget too; lower --max-kb or raise --pages")
+    if after > max_kb:
+        failures.append("session memory over budget")
+    return before, after, list(dict.fromkeys(failures))  # once each, not once per iteration
+
+
+def test_session_memory_budget():
+    before, after, failures = measure()
+    assert not failures, f"before {before:.1f} KB, after {after:.1f} KB: {failures}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2, help="research iterations (the graph runs at most 2)")
+    parser.add_argument("--pages", type=int, default=15, help="pages scraped per iteration")
+    parser.add_argument("--spill-kb", type=int, default=16, help="ContentStore spill threshold")
+    parser.add_argument("--max-kb", type=float, default=96, help="fail if the new flow keeps more alive")
+    args = parser.parse_args()
+
+    before, after, failures = measure(args.iterations, args.pages, args.spill_kb, args.max_kb)
+    print(f"before (nothing spilled or released): {before:8.1f} KB kept alive at peak")
+    print(f"after  (ContentStore):                {after:8.1f} KB kept alive at peak  (budget {args.max_kb:.0f} KB)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
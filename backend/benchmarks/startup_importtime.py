@@ -0,0 +1,83 @@
+"""
+Startup benchmark: import time per module for the API server.
+
+Runs `python -X importtime` in fresh interpreters and sums the self time of
+every imported module, at any depth, by top-level package (so `langchain_core`
+includes all of its submodules, however they were reached). Two scenarios:
+
+- before: importing `agent.graph` eagerly, as main.py used to do
+- after:  importing `main`, which now defers the graph to the lifespan warm-up
+
+The slowest packages are listed side by side, before and after.
+
+Usage (from the backend directory):
+    python benchmarks/startup_importtime.py [--top 15] [--runs 3]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "before (eager agent.graph)": "import fastapi, agent.graph",
+    "after (lazy main)": "import main",
+}
+
+LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(statement: str):
+    """Returns ({top_level_package: self_us}, total_us) for one fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"`{statement}` failed:\n{proc.stderr[-2000:]}")
+
+    per_package = defaultdict(int)
+    total = 0
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if not match:
+            continue
+        # Self time counts each module once, whichever package imported it
+        self_us, module = int(match.group(1)), match.group(4)
+        per_package[module.split(".")[0]] += self_us
+        total += self_us
+    return per_package, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="packages to list per scenario")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per scenario (median is reported)")
+    args = parser.parse_args()
+
+    totals, packages = {}, {}
+    for name, statement in SCENARIOS.items():
+        runs = [measure(statement) for _ in range(args.runs)]
+        names = set().union(*(r[0] for r in runs))
+        totals[name] = statistics.median(total for _, total in runs)
+        packages[name] = {pkg: statistics.median(r[0].get(pkg, 0) for r in runs) for pkg in names}
+
+    before_name, after_name = SCENARIOS
+    before, after = packages[before_name], packages[after_name]
+    slowest = sorted(set(before) | set(after), key=lambda pkg: -max(before.get(pkg, 0), after.get(pkg, 0)))
+
+    print(f"\n{'package (self time, ms)':<30} {'before':>9} {'after':>9}")
+    for pkg in slowest[:args.top]:
+        print(f"  {pkg:<28} {before.get(pkg, 0) / 1000:>9.1f} {after.get(pkg, 0) / 1000:>9.1f}")
+    print(f"  {'total':<28} {totals[before_name] / 1000:>9.1f} {totals[after_name] / 1000:>9.1f}")
+
+    saved = totals[before_name] - totals[after_name]
+    print(f"\nImport time saved at startup: {saved / 1000:.1f} ms ({saved / totals[before_name] * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
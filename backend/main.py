@@ -1,16 +1,39 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from fastapi.responses import StreamingResponse
-import json
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 import asyncio
-import traceback
-from agent.graph import app as agent_app
+import json
+import time
+from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Load .env before any module reads its configuration
+load_dotenv()
+
+# Only light modules are imported here; the graph and its dependencies
+# (LangGraph, LangChain, BeautifulSoup) load lazily via agent.runtime
+from agent.runtime import get_agent_app, get_batch_run, get_followup_app, warm_up, warmup_state
+from agent.state import build_followup_state, build_initial_state
+from agent.streaming import HEARTBEAT_INTERVAL, ResearchRun, coalesce, format_sse, stream_run
+from agent.utils.report_cache import JOB_POLL_INTERVAL, ReportCache, STALE, make_cache_key
+from agent.utils.router import ModelRouter
+from agent.utils.sessions import SessionRecorder, SessionStore, make_session_id
+from agent.tools.host_health import host_health
+from agent.utils.storage import get_storage
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the server can answer /health right away
+    asyncio.get_running_loop().run_in_executor(None, warm_up)
+    yield
 
 app = FastAPI(
     title="Deep Research Agent API",
     description="Advanced AI-powered research assistant with LangGraph",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Allow CORS for frontend
@@ -26,20 +49,103 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+report_cache = ReportCache.from_env()
+session_store = SessionStore.from_env()
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
 class ResearchRequest(BaseModel):
     topic: str
     model: str = "openai/gpt-4o-mini"  # Default model
+    bypass_cache: bool = False  # Force a fresh run even if a cached report exists
+    max_cost_usd: Optional[float] = Field(None, gt=0)  # LLM spend budget; models are downgraded to stay within it
+    max_latency_s: Optional[float] = Field(None, gt=0)  # Wall-clock budget for the whole run
     
     class Config:
         json_schema_extra = {
             "example": {
                 "topic": "Artificial Intelligence in Healthcare",
-                "model": "openai/gpt-4o-mini"
+                "model": "openai/gpt-4o-mini",
+                "bypass_cache": False,
+                "max_cost_usd": 0.05,
+                "max_latency_s": 180
             }
         }
 
+def start_cached_run(key: str, initial_state: dict, detached: bool = False,
+                     router: Optional[ModelRouter] = None, refresh: bool = False) -> ResearchRun:
+    """
+    Starts a graph run whose report is written back to the cache, and registers
+    it so identical concurrent requests can join it. The caller must hold the
+    job claim for `key`; it is released when the run ends. The run's outcome is
+    retained as a session for follow-up questions. A `refresh` run (bypass_cache
+    or a stale refresh) doesn't reuse cached LLM responses, so it can't
+    reproduce the report it replaces.
+
+    The graph must already be loaded (`await asyncio.to_thread(get_agent_app)`)
+    so nothing is imported on the event loop.
+    """
+    run = ResearchRun(
+        get_agent_app(),
+        initial_state,
+        detached=detached,
+        on_complete=lambda report: report_cache.store(key, report),
+        router=router,
+        recorder=SessionRecorder(session_store, make_session_id(key), initial_state),
+        configurable={"no_llm_cache": refresh}
+    ).start()
+    report_cache.track_run(key, run)
+    return run
+
+async def stream_cached_report(key: str, report: str, status: str):
+    complete = {"type": "complete", "report": report, "cached": True, "cache_status": status}
+    # Reports outlive their sessions (REPORT_CACHE_MAX_AGE vs SESSION_TTL); only
+    # offer follow-ups while the session behind the report is still retained
+    session_id = make_session_id(key)
+    if await asyncio.to_thread(session_store.exists, session_id):
+        complete["session_id"] = session_id
+    yield coalesce([
+        {"type": "update", "node": "cache", "message": f"Loaded {status} cached report"},
+        complete
+    ])
+
+async def follow_remote_run(key: str, initial_state: dict, http_request: Request,
+                            router: Optional[ModelRouter] = None, refresh: bool = False):
+    """
+    Waits for a run that another worker has claimed and streams its report once
+    it lands in the shared storage. Takes the run over if that worker gives up.
+    """
+    started = time.time()
+    yield format_sse({"type": "update", "node": "cache", "message": "Joining research already in progress"})
+    last_write = time.monotonic()
+
+    while not await http_request.is_disconnected():
+        report, still_claimed = await report_cache.check_remote(key, started)
+        if report is not None:
+            async for message in stream_cached_report(key, report, "fresh"):
+                yield message
+            return
+
+        if not still_claimed:
+            run, claimed = await report_cache.join_or_claim(key)
+            if run is None and claimed:
+                run = start_cached_run(key, initial_state, router=router, refresh=refresh)
+            if run is not None:
+                async for message in stream_run(run, http_request):
+                    yield message
+                return
+
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+        if time.monotonic() - last_write >= HEARTBEAT_INTERVAL:
+            yield ": heartbeat\n\n"
+            last_write = time.monotonic()
+
 @app.post("/research")
-async def start_research(request: ResearchRequest):
+async def start_research(request: ResearchRequest, http_request: Request):
     """
     Starts a research task and streams the output as Server-Sent Events (SSE).
     
@@ -48,138 +154,195 @@ async def start_research(request: ResearchRequest):
     2. Search for information
     3. Analyze and synthesize findings
     4. Generate a comprehensive report
+
+    Reports are cached per normalized topic and model. Fresh hits are streamed
+    immediately; stale hits are streamed immediately while a background run
+    refreshes them. Identical concurrent requests share a single run, also
+    across workers through job claims in the shared storage.
+
+    Each node's LLM calls are routed per role (see agent/utils/router.py) and
+    downgraded when `max_cost_usd` or `max_latency_s` would be exceeded; a final
+    `usage` message reports actual spend and latency per node.
+
+    The run is cancelled once no client is following it. Idle periods are filled
+    with heartbeat comments and bursts of progress events arrive as `batch` messages.
     """
     if not request.topic or not request.topic.strip():
         raise HTTPException(status_code=400, detail="Topic cannot be empty")
     
-    async def event_generator():
-        initial_state = {
-            "topic": request.topic.strip(),
-            "model": request.model,
-            "plan": [],
-            "past_steps": [],
-            "search_queries": [],
-            "search_results": [],
-            "research_notes": [],
-            "report": "",
-            "is_finished": False,
-            "iteration": 0
-        }
-        
-        try:
-            # Stream events from the graph
-            for event in agent_app.stream(initial_state):
-                # event is a dict like {'node_name': {state_updates}}
-                for node_name, state_update in event.items():
-                    # Send detailed messages based on node
-                    if node_name == "planner":
-                        queries = state_update.get("search_queries", [])
-                        for query in queries:
-                            data = {
-                                "type": "update",
-                                "node": node_name,
-                                "message": f"Searching for: {query}"
-                            }
-                            yield f"data: {json.dumps(data)}\n\n"
-                            await asyncio.sleep(0)  # Allow other tasks to run
-                    
-                    elif node_name == "search":
-                        data = {
-                            "type": "update",
-                            "node": node_name,
-                            "message": "Searching..."
-                        }
-                        yield f"data: {json.dumps(data)}\n\n"
-                    
-                    elif node_name == "scrape":
-                        # Send scraped URLs to frontend
-                        scraped_urls = state_update.get("scraped_urls", [])
-                        for item in scraped_urls:
-                            data = {
-                                "type": "update",
-                                "node": node_name,
-                                "message": f"Scraping: {item['url']}"
-                            }
-                            yield f"data: {json.dumps(data)}\n\n"
-                            await asyncio.sleep(0)
-                        
-                        # Send general message if no URLs
-                        if not scraped_urls:
-                            data = {
-                                "type": "update",
-                                "node": node_name,
-                                "message": "Reading sources..."
-                            }
-                            yield f"data: {json.dumps(data)}\n\n"
-                    
-                    elif "analyze" in node_name:
-                        data = {
-                            "type": "update",
-                            "node": node_name,
-                            "message": "ANALYZING"
-                        }
-                        yield f"data: {json.dumps(data)}\n\n"
-                    
-                    elif node_name == "synthesize_parallel":
-                        data = {
-                            "type": "update",
-                            "node": node_name,
-                            "message": "SYNTHESIZING"
-                        }
-                        yield f"data: {json.dumps(data)}\n\n"
-                    
-                    elif node_name == "writer":
-                        data = {
-                            "type": "update",
-                            "node": node_name,
-                            "message": "WRITING"
-                        }
-                        yield f"data: {json.dumps(data)}\n\n"
-                    
-                    else:
-                        # Generic update for other nodes
-                        data = {
-                            "type": "update",
-                            "node": node_name,
-                            "message": f"✓ Completed: {node_name.replace('_', ' ').title()}"
-                        }
-                        yield f"data: {json.dumps(data)}\n\n"
-                    
-                    # If we have a report, send it specifically
-                    if "report" in state_update and state_update["report"]:
-                        data = {
-                            "type": "complete",
-                            "report": state_update["report"]
-                        }
-                        yield f"data: {json.dumps(data)}\n\n"
-                        
-        except Exception as e:
-            print(f"Error in research agent: {str(e)}")
-            print(traceback.format_exc())
-            error_data = {
-                "type": "error", 
-                "message": f"Research error: {str(e)}"
+    key = make_cache_key(request.topic, request.model)
+    initial_state = build_initial_state(request.topic, request.model)
+
+    if not request.bypass_cache:
+        # Storage calls can block (SQLite busy timeout, Redis round trips), so keep them off the loop
+        report, status = await asyncio.to_thread(report_cache.lookup, key)
+        if report is not None:
+            if status == STALE and report_cache.get_run(key) is None:
+                await asyncio.to_thread(get_agent_app)
+                if await asyncio.to_thread(report_cache.claim, key):
+                    print(f"Serving stale report, refreshing in background: {key}")
+                    start_cached_run(key, initial_state, detached=True, refresh=True)
+            return StreamingResponse(
+                stream_cached_report(key, report, status),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
+
+    # Normally already built by the startup warm-up; never import on the event loop
+    await asyncio.to_thread(get_agent_app)
+    router = ModelRouter.from_env(request.max_cost_usd, request.max_latency_s)
+    run, claimed = await report_cache.join_or_claim(key)
+    if run is None and not claimed:
+        # Another worker is already researching this topic
+        return StreamingResponse(
+            follow_remote_run(key, initial_state, http_request, router, refresh=request.bypass_cache),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS
+        )
+    if run is None:
+        run = start_cached_run(key, initial_state, router=router, refresh=request.bypass_cache)
+
+    return StreamingResponse(
+        stream_run(run, http_request), 
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+class FollowUpRequest(BaseModel):
+    session_id: str  # From the `complete` message of a previous run
+    question: str
+    model: Optional[str] = None  # Defaults to the model of the original run
+    max_cost_usd: Optional[float] = Field(None, gt=0)
+    max_latency_s: Optional[float] = Field(None, gt=0)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "session_id": "3f2a9c0d1b7e4a56",
+                "question": "How does regulation differ between the EU and the US?"
             }
-            yield f"data: {json.dumps(error_data)}\n\n"
+        }
+
+@app.post("/research/followup")
+async def follow_up_research(request: FollowUpRequest, http_request: Request):
+    """
+    Answers a follow-up question by extending a previous run's report instead
+    of researching the topic again.
+
+    The retained session (notes and sources) is reused: only a few targeted
+    queries are searched, pages already read are not fetched again (their
+    text comes from the page cache), and only the affected report sections are rewritten (or a new
+    section is added). The result is streamed like /research, and its
+    `complete` message carries the ID of a new session for further follow-ups.
+    """
+    if not request.question or not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+
+    session = await asyncio.to_thread(session_store.get, request.session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired; start a new research run")
+
+    initial_state = build_followup_state(session, request.question, request.model or session["model"])
+    run = ResearchRun(
+        await asyncio.to_thread(get_followup_app),
+        initial_state,
+        router=ModelRouter.from_env(request.max_cost_usd, request.max_latency_s),
+        recorder=SessionRecorder(session_store, make_session_id(), initial_state, parent=session),
+        configurable={"session": session}
+    ).start()
 
     return StreamingResponse(
-        event_generator(), 
+        stream_run(run, http_request),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
+        headers=SSE_HEADERS
+    )
+
+class BatchResearchRequest(BaseModel):
+    topics: List[str] = Field(..., min_length=1, max_length=100)
+    model: str = "openai/gpt-4o-mini"
+    format: Literal["sse", "jsonl"] = "sse"
+    max_concurrency: int = Field(4, ge=1, le=16)  # Graph runs in flight at once
+    bypass_cache: bool = False
+    max_cost_usd: Optional[float] = Field(None, gt=0)  # Per-topic LLM spend budget
+    max_latency_s: Optional[float] = Field(None, gt=0)  # Per-topic wall-clock budget
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "topics": ["Nvidia AI strategy", "AMD AI strategy", "Intel AI strategy"],
+                "model": "openai/gpt-4o-mini",
+                "format": "jsonl",
+                "max_concurrency": 4
+            }
         }
+
+@app.post("/research/batch")
+async def start_batch_research(request: BatchResearchRequest, http_request: Request):
+    """
+    Researches many topics with a shared scheduler and streams per-topic results
+    as they complete, either as SSE (`format=sse`) or JSON Lines (`format=jsonl`).
+
+    Identical search queries and canonical URLs are fetched once for the whole
+    batch and scraped text is reused between topics. A final `summary` record
+    reports how much work was shared.
+    """
+    BatchRun = await asyncio.to_thread(get_batch_run)
+    batch = BatchRun(
+        get_agent_app(),
+        request.topics,
+        request.model,
+        max_concurrency=request.max_concurrency,
+        report_cache=report_cache,
+        bypass_cache=request.bypass_cache,
+        max_cost_usd=request.max_cost_usd,
+        max_latency_s=request.max_latency_s
     )
+    if not batch.topics:
+        raise HTTPException(status_code=400, detail="At least one non-empty topic is required")
+
+    async def batch_generator():
+        async for result in batch.results(idle_timeout=HEARTBEAT_INTERVAL):
+            if await http_request.is_disconnected():
+                print("Client disconnected, cancelling batch research")
+                break
+            if result is None:
+                # Nothing finished for a while; keep the connection alive
+                if request.format == "sse":
+                    yield ": heartbeat\n\n"
+                continue
+            if request.format == "sse":
+                yield format_sse(result)
+            else:
+                yield json.dumps(result) + "\n"
+
+    media_type = "text/event-stream" if request.format == "sse" else "application/x-ndjson"
+    return StreamingResponse(batch_generator(), media_type=media_type, headers=SSE_HEADERS)
 
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
+    storage = get_storage()
     return {
         "status": "ok",
         "service": "Deep Research Agent API",
-        "version": "2.0.0"
+        "version": "2.0.0",
+        "storage": {"backend": storage.name, "stats": storage.stats},
+        "unhealthy_hosts": [h["host"] for h in host_health.snapshot() if h["circuit_open"]]
     }
 
+@app.get("/ready")
+def readiness_check():
+    """
+    Readiness probe: 200 once the graph and clients are warmed up, 503 before.
+    Unlike /health, this tells the platform whether requests will be served fast.
+    """
+    if not warmup_state["ready"]:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "warming", "error": warmup_state["error"]}
+        )
+    return {"status": "ready", "warmup_seconds": warmup_state["seconds"]}
+
 @app.get("/")
 def root():
     """Root endpoint with API information"""
@@ -188,7 +351,10 @@ def root():
         "version": "2.0.0",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
             "research": "/research (POST)",
+            "batch": "/research/batch (POST)",
+            "followup": "/research/followup (POST)",
             "docs": "/docs"
         }
     }
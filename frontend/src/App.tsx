@@ -17,9 +17,22 @@ interface LogEntry {
   timestamp: number;
 }
 
+interface StreamEvent {
+  type: 'update' | 'complete' | 'error' | 'batch' | 'usage';
+  message?: string;
+  node?: string;
+  report?: string;
+  title?: string;
+  score?: number;
+  duplicates?: string[];
+  events?: StreamEvent[];
+}
+
 interface Source {
   url: string;
   title?: string;
+  score?: number;
+  duplicates?: string[];
 }
 
 function App() {
@@ -267,6 +280,54 @@ function App() {
       let hasReceivedData = false;
       let reportReceived = false;
 
+      const handleEvent = (data: StreamEvent) => {
+        if (data.type === 'update') {
+          const message = data.message || '';
+
+          // Parse messages for UI updates
+          if (message.startsWith('Searching for:')) {
+            const query = message.replace('Searching for:', '').trim();
+            setSearchQueries(prev => [...new Set([...prev, query])]);
+            setCurrentStep('Searching...');
+          } else if (message.startsWith('Scraping:')) {
+            const url = message.replace('Scraping:', '').trim();
+            setSources(prev => {
+              if (prev.some(s => s.url === url)) return prev;
+              return [...prev, { url, title: data.title || undefined, score: data.score ?? undefined, duplicates: data.duplicates }];
+            });
+            setCurrentStep('Reading sources...');
+          } else if (message.includes('ANALYZING')) {
+            setCurrentStep('Analyzing data...');
+          } else if (message.includes('SYNTHESIZING')) {
+            setCurrentStep('Synthesizing findings...');
+          } else if (message.includes('WRITING')) {
+            setCurrentStep('Writing report...');
+          }
+
+          setLogs(prev => [...prev, {
+            id: Math.random().toString(36).substr(2, 9),
+            type: 'update',
+            message: data.message,
+            node: data.node,
+            timestamp: Date.now()
+          }]);
+        } else if (data.type === 'complete') {
+          reportReceived = true;
+          setReport(data.report ?? null);
+          setIsResearching(false);
+          showNotification('Research completed successfully!');
+        } else if (data.type === 'error') {
+          setLogs(prev => [...prev, {
+            id: Math.random().toString(36).substr(2, 9),
+            type: 'error',
+            message: data.message,
+            timestamp: Date.now()
+          }]);
+          setIsResearching(false);
+          showNotification('Research encountered an error');
+        }
+      };
+
       while (true) {
         const { value, done } = await reader.read();
 
@@ -288,53 +349,10 @@ function App() {
         for (const line of lines) {
           if (line.startsWith('data: ')) {
             try {
-              const data = JSON.parse(line.slice(6));
-
-              if (data.type === 'update') {
-                const message = data.message || '';
-
-                // Parse messages for UI updates
-                if (message.startsWith('Searching for:')) {
-                  const query = message.replace('Searching for:', '').trim();
-                  setSearchQueries(prev => [...new Set([...prev, query])]);
-                  setCurrentStep('Searching...');
-                } else if (message.startsWith('Scraping:')) {
-                  const url = message.replace('Scraping:', '').trim();
-                  setSources(prev => {
-                    if (prev.some(s => s.url === url)) return prev;
-                    return [...prev, { url }];
-                  });
-                  setCurrentStep('Reading sources...');
-                } else if (message.includes('ANALYZING')) {
-                  setCurrentStep('Analyzing data...');
-                } else if (message.includes('SYNTHESIZING')) {
-                  setCurrentStep('Synthesizing findings...');
-                } else if (message.includes('WRITING')) {
-                  setCurrentStep('Writing report...');
-                }
-
-                setLogs(prev => [...prev, {
-                  id: Math.random().toString(36).substr(2, 9),
-                  type: 'update',
-                  message: data.message,
-                  node: data.node,
-                  timestamp: Date.now()
-                }]);
-              } else if (data.type === 'complete') {
-                reportReceived = true;
-                setReport(data.report);
-                setIsResearching(false);
-                showNotification('Research completed successfully!');
-              } else if (data.type === 'error') {
-                setLogs(prev => [...prev, {
-                  id: Math.random().toString(36).substr(2, 9),
-                  type: 'error',
-                  message: data.message,
-                  timestamp: Date.now()
-                }]);
-                setIsResearching(false);
-                showNotification('Research encountered an error');
-              }
+              const data: StreamEvent = JSON.parse(line.slice(6));
+              // Bursts of progress events are coalesced into a single batch message
+              const events = data.type === 'batch' ? data.events ?? [] : [data];
+              events.forEach(handleEvent);
             } catch (parseError) {
               console.warn('Failed to parse SSE data:', line, parseError);
             }
@@ -561,6 +579,8 @@ function App() {
                                 </span>
                                 <span className="text-[10px] sm:text-xs text-gray-500 truncate">
                                   {new URL(source.url).hostname}
+                                  {source.score !== undefined && ` · relevance ${Math.round(source.score * 100)}%`}
+                                  {source.duplicates && source.duplicates.length > 0 && ` · +${source.duplicates.length} mirror${source.duplicates.length > 1 ? 's' : ''}`}
                                 </span>
                               </div>
                             </div>